@@ -5,17 +5,26 @@ Flask Web 服务器
 """
 
 import os
+import io
+import re
+import codecs
 import sys
 import json
 import uuid
+import shutil
 import traceback
 import logging
-from flask import Flask, render_template, request, jsonify
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import orjson
+from flask import Flask, Response, render_template, request, jsonify, send_file
+from flask.json.provider import DefaultJSONProvider
 from werkzeug.utils import secure_filename
 
 # 配置日志 - 确保输出到控制台和文件
-import sys
-
 # 创建日志格式
 log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 date_format = '%Y-%m-%d %H:%M:%S'
@@ -36,18 +45,37 @@ logger.info("=" * 60)
 logger.info("🚀 AI 剧本评测系统启动")
 logger.info("=" * 60)
 
-# 添加 src 目录到路径
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
-
 from src.evaluator import ScriptEvaluator
 from src.report_generator import ReportGenerator
 from src.new_report_generator import NewReportGenerator
 from src.history_manager import HistoryManager
 from src.novel_generator import NovelGenerator
+from src.pdf_workers import extract_pdf_pages
 from src.api_client import DoubaoAPIClient
+from dotenv import load_dotenv
+
+# 启动时加载一次环境变量，避免每个请求重复读取 .env
+load_dotenv()
+
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """使用 orjson 的 Flask JSON 序列化器，遇到 orjson 不支持的对象时回退到标准实现"""
+
+    def dumps(self, obj, **kwargs):
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 最大 50MB
+app.config['MAX_FORM_MEMORY_SIZE'] = 256 * 1024  # 非文件表单字段最大 256KB，文件部分由 Werkzeug 写入临时文件
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
 app.config['OUTPUT_FOLDER'] = os.path.join(os.path.dirname(__file__), 'outputs')
 
@@ -58,66 +86,234 @@ os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
 # 初始化历史记录管理器
 history_manager = HistoryManager()
 
+# 后台评测任务（进程内线程池 + 内存任务表）
+_MAX_EVALUATION_JOBS = 200
+_evaluation_executor = ThreadPoolExecutor(max_workers=int(os.getenv('EVAL_JOB_WORKERS', '2')))
+_evaluation_jobs = OrderedDict()
+_evaluation_jobs_lock = threading.Lock()
+
+# 最近生成的文本报告缓存（报告文件名带时间戳，生成后不会再变化）
+_REPORT_CACHE_SIZE = 64
+_REPORT_CACHE_SUFFIXES = ('.md', '.json')
+_REPORT_MIMETYPES = {'.md': 'text/markdown', '.json': 'application/json'}
+_report_cache = OrderedDict()
+_report_cache_lock = threading.Lock()
+
 # 允许的文件扩展名
 ALLOWED_EXTENSIONS = {'txt', 'pdf', 'docx'}
 
+# 预编译文本清理用的正则表达式（避免每次请求重复编译）
+# 字符类正则同时作为 _CharFilterTable 的判定依据
+# 剧本文本保留字符：中文、英文、数字、常用标点、换行符
+_CLEAN_RE = re.compile(r'[^\u4e00-\u9fff\u3400-\u4dbfa-zA-Z0-9\s\.,!?;:：，。！？；、()\[\]""''《》·—·…～–—/=@#\\%^&*+|{}<>\n\r\t]')
+_BLANK_RE = re.compile(r'\n\s*\n\s*\n+')
+_UNCLOSED_BRACKET_RE = re.compile(r'【([^】]*$)')
+_SPLIT_RE = re.compile(r'([。！？\.!?])')
+# DOCX 控制字符与零宽字符（合并为一次替换）
+_DOCX_INVISIBLE_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f\u200b-\u200d\u2060\uFEFF]')
+_INLINE_SPACES_RE = re.compile(r'[ \t]+')
+_TRAILING_SPACES_RE = re.compile(r' +\n')
+# 文本质量检查
+_CHINESE_CHAR_RE = re.compile(r'[\u4e00-\u9fff]')
+_ENGLISH_CHAR_RE = re.compile(r'[a-zA-Z]')
+_AGGRESSIVE_CLEAN_RE = re.compile(r'[^\u4e00-\u9fffa-zA-Z0-9\s\.,!?;:：，。！？；、()\[\]""''《》·—\-–—/]')
+_WHITESPACE_RE = re.compile(r'\s+')
+# 剧本改进：集数检测
+# "第X集"、"第 X 章"、"Episode X"、"EP.X" 合并为一个模式，单次扫描
+_EPISODE_RE = re.compile(r'第\s*(\d+)\s*[集章]|Episode\s*(\d+)|EP[.\s]*(\d+)', re.IGNORECASE)
+_EPISODE_SECTION_RE = re.compile(r'分集剧本\s*(.*?)(?=\n\s*\n|\Z)', re.DOTALL)
+_STANDALONE_NUMBER_RE = re.compile(r'^(\d+)$', re.MULTILINE)
+_PROMPT_EPISODE_COUNT_RE = re.compile(r'原剧本共有 (\d+) 集')
+# 一次遍历完成 BOM 移除、\r 换行统一和全角空格转换
+_NORMALIZE_TRANS = str.maketrans({'\ufeff': None, '\r': '\n', '\u3000': ' '})
+
+
+class _CharFilterTable(dict):
+    """
+    str.translate 使用的字符过滤表
+
+    首次遇到某个码位时用字符类正则判断是否需要移除，并缓存结果；
+    之后同一字符的查找都在 C 层的 dict 中完成，避免正则逐字符匹配。
+    """
+
+    def __init__(self, drop_pattern):
+        super().__init__()
+        self._drop_pattern = drop_pattern
+
+    def __missing__(self, code):
+        value = None if self._drop_pattern.match(chr(code)) else code
+        self[code] = value
+        return value
+
+
+_CLEAN_TABLE = _CharFilterTable(_CLEAN_RE)
+
+
+# 上传文件落盘时的拷贝块大小
+_UPLOAD_COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def save_upload_file(stream, dest_path):
+    """
+    以大块流式拷贝的方式保存上传文件
+
+    Args:
+        stream: 上传文件数据流（FileStorage.stream 或 request.stream）
+        dest_path: 目标路径
+    """
+    with open(dest_path, 'wb') as out:
+        shutil.copyfileobj(stream, out, _UPLOAD_COPY_BUFFER_SIZE)
+
+
+# 评测配置文件路径
+_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.yml')
+
+
+def is_truthy_flag(value):
+    """判断请求参数是否为开启状态（1/true/yes）"""
+    return (value or '').lower() in ('1', 'true', 'yes')
+
+
+@functools.lru_cache(maxsize=1)
+def _evaluator_for_config(path, mtime_ns, size):
+    """按配置文件的路径、修改时间和大小缓存评测器实例"""
+    return ScriptEvaluator(config_path=path)
+
+
+def get_evaluator():
+    """
+    获取进程内共享的评测器实例
+
+    config.yml 未修改时复用同一实例（配置和 API 客户端只初始化一次），修改后自动重建；
+    提示词模板在每次评测时由评测器按修改时间检查，无需重建。
+    被替换的旧实例在进行中的评测结束后随引用释放，其线程池随之退出。
+    """
+    st = os.stat(_CONFIG_PATH)
+    return _evaluator_for_config(_CONFIG_PATH, st.st_mtime_ns, st.st_size)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_config_file(path, mtime_ns, size):
+    """解析评测配置文件（按路径、修改时间和大小缓存，文件修改后自动重新解析）"""
+    import yaml
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
+def load_evaluation_config():
+    """
+    读取评测配置（config.yml 未修改时复用上次的解析结果）
+
+    仅需要维度信息的接口使用它，无需初始化 API 客户端。
+    """
+    st = os.stat(_CONFIG_PATH)
+    return _load_config_file(_CONFIG_PATH, st.st_mtime_ns, st.st_size)
+
+
+def allowed_file(file_ext):
+    """检查文件扩展名（小写、不含点）是否允许"""
+    return file_ext in ALLOWED_EXTENSIONS
+
+
+def _extract_pdf_with_pypdfium2(file_path):
+    """使用 pypdfium2（PDFium C++ 引擎）提取 PDF 文本（页数较多时多进程并行）"""
+    page_texts = extract_pdf_pages('pypdfium2', file_path)
+    return "".join(page_text + "\n" for page_text in page_texts if page_text)
+
 
-def allowed_file(filename):
-    """检查文件扩展名是否允许"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def _extract_pdf_with_pymupdf(file_path):
+    """使用 PyMuPDF（MuPDF C 引擎）提取 PDF 文本"""
+    import fitz
+    with fitz.open(file_path) as doc:
+        page_texts = [page.get_text("text") for page in doc]
+    return "".join(page_text + "\n" for page_text in page_texts if page_text)
+
+
+def _extract_pdf_with_pdfplumber(file_path):
+    """使用 pdfplumber 提取 PDF 文本（页数较多时多进程并行）"""
+    page_texts = extract_pdf_pages('pdfplumber', file_path)
+    return "".join(page_text + "\n" for page_text in page_texts if page_text)
+
+
+def _extract_pdf_with_pypdf2(file_path):
+    """使用 PyPDF2 提取 PDF 文本"""
+    import PyPDF2
+    with open(file_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        page_texts = [page.extract_text() for page in reader.pages]
+    return "".join(page_text + "\n" for page_text in page_texts if page_text)
+
+
+# PDF 提取器按优先级排列：pypdfium2 / PyMuPDF 速度快且中文提取质量好，pdfplumber 较慢，PyPDF2 兜底
+_PDF_EXTRACTORS = [
+    ("pypdfium2", _extract_pdf_with_pypdfium2),
+    ("PyMuPDF", _extract_pdf_with_pymupdf),
+    ("pdfplumber", _extract_pdf_with_pdfplumber),
+    ("PyPDF2", _extract_pdf_with_pypdf2),
+]
+
+
+# PDF 底层代码的特征串，出现 3 种及以上视为提取失败
+_PDF_INDICATORS = ('/Rect', '/Font', '/Subtype', '/Resources', '/MediaBox', 'stream', 'endstream')
+# 使用零宽前瞻逐位置匹配，特征串之间相互重叠（如 /Resourcestream）时也不会漏检
+_PDF_INDICATOR_RE = re.compile('(?=(%s))' % '|'.join(re.escape(w) for w in sorted(_PDF_INDICATORS, key=len, reverse=True)))
+# 命中某个特征串时同时命中的所有特征（如 endstream 同时包含 stream）
+_PDF_INDICATOR_IMPLIES = {w: frozenset(v for v in _PDF_INDICATORS if v in w) for w in _PDF_INDICATORS}
+
+
+def _count_pdf_indicators(text, limit=3):
+    """
+    单次扫描统计全文中出现的 PDF 特征串种类数
+
+    Args:
+        text: 待检测文本
+        limit: 达到该数量即提前返回
+
+    Returns:
+        出现的特征串种类数（最多统计到 limit）
+    """
+    found = set()
+    for match in _PDF_INDICATOR_RE.finditer(text):
+        found |= _PDF_INDICATOR_IMPLIES[match.group(1)]
+        if len(found) >= limit:
+            return limit
+    return len(found)
 
 
 def extract_text_from_pdf(file_path):
     """从 PDF 文件中提取文本"""
     text = ""
     extraction_method = ""
+    last_error = None
 
-    # 首先尝试 pdfplumber（通常对中文支持更好）
-    try:
-        import pdfplumber
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        extraction_method = "pdfplumber"
-        logger.info(f"使用 pdfplumber 成功提取文本，共 {len(text)} 字符")
-    except Exception as e:
-        logger.warning(f"pdfplumber 提取失败: {str(e)}，尝试 PyPDF2")
-        # 回退到 PyPDF2
+    for method, extractor in _PDF_EXTRACTORS:
         try:
-            import PyPDF2
-            with open(file_path, 'rb') as f:
-                reader = PyPDF2.PdfReader(f)
-                for page in reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-            extraction_method = "PyPDF2"
-            logger.info(f"使用 PyPDF2 成功提取文本，共 {len(text)} 字符")
-        except Exception as e2:
-            logger.error(f"PyPDF2 提取也失败: {str(e2)}")
-            raise RuntimeError(f"无法解析 PDF 文件。请确保 PDF 包含可提取的文本（而非扫描图片）。错误: {str(e2)}")
+            text = extractor(file_path)
+        except ImportError as e:
+            logger.debug(f"{method} 未安装，跳过: {str(e)}")
+            last_error = e
+            continue
+        except Exception as e:
+            logger.warning(f"{method} 提取失败: {str(e)}，尝试下一种方式")
+            last_error = e
+            continue
+        extraction_method = method
+        logger.info(f"使用 {method} 成功提取文本，共 {len(text)} 字符")
+        break
+    else:
+        logger.error(f"所有 PDF 提取方式均失败: {str(last_error)}")
+        raise RuntimeError(f"无法解析 PDF 文件。请确保 PDF 包含可提取的文本（而非扫描图片）。错误: {str(last_error)}")
 
     # 检查提取的有效性
     if len(text.strip()) < 50:
         raise RuntimeError(f"PDF 文本提取失败：提取的文本过短（{len(text.strip())} 字符）。可能是：1) 扫描版 PDF（图片格式）2) 加密或损坏的 PDF。请尝试使用可复制文本的 PDF 文件。")
 
     # 检查是否包含大量 PDF 底层代码（表示提取失败）
-    pdf_indicators = ['/Rect', '/Font', '/Subtype', '/Resources', '/MediaBox', 'stream', 'endstream']
-    indicator_count = sum(1 for indicator in pdf_indicators if indicator in text)
-    if indicator_count >= 3:
+    if _count_pdf_indicators(text) >= 3:
         logger.error(f"检测到 PDF 底层代码，提取可能失败")
         raise RuntimeError(f"PDF 文本提取异常：内容包含 PDF 底层代码。这通常表示 PDF 文件格式特殊或损坏。请尝试重新导出 PDF 文件，或使用 TXT 格式。")
 
-    # 清理文本，移除无效字符，保留中文、英文、数字和常用标点
-    import re
-    # 保留：中文字符、字母、数字、常用标点、换行符
-    text = re.sub(r'[^\u4e00-\u9fff\u3400-\u4dbfa-zA-Z0-9\s\.,!?;:：，。！？；、\(\)\[\]""''《》·—\n\r\t]', '', text)
-    # 移除过多的空白行
-    text = re.sub(r'\n\s*\n', '\n\n', text)
-
-    logger.info(f"PDF 文本清理完成，最终长度: {len(text.strip())} 字符")
+    # 字符清理统一交给 clean_script_text，这里只返回原始提取结果
     return text.strip()
 
 
@@ -168,18 +364,14 @@ def extract_text_from_docx(file_path):
             raise RuntimeError(f"DOCX 文本提取失败：提取的文本过短（{raw_length} 字符）。请检查文件是否为空或损坏。")
 
         # 先进行基本清理
-        import re
         logger.info("开始清理DOCX文本...")
 
-        # 移除DOCX特有的控制字符和不可见字符
-        text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
-
-        # 移除零宽字符
-        text = re.sub(r'[\u200b-\u200d\u2060\uFEFF]', '', text)
+        # 移除DOCX特有的控制字符、不可见字符和零宽字符
+        text = _DOCX_INVISIBLE_RE.sub('', text)
 
         # 移除多余的空白字符，但保留换行
-        text = re.sub(r'[ \t]+', ' ', text)  # 多个空格/制表符合并为一个
-        text = re.sub(r' +\n', '\n', text)  # 移除行尾空格
+        text = _INLINE_SPACES_RE.sub(' ', text)  # 多个空格/制表符合并为一个
+        text = _TRAILING_SPACES_RE.sub('\n', text)  # 移除行尾空格
 
         # 统一中英文标点
         text = text.replace('．', '。').replace('，', ',').replace('．', '.')
@@ -202,33 +394,52 @@ def extract_text_from_docx(file_path):
         raise RuntimeError("缺少 python-docx 库。请运行: pip install python-docx")
     except Exception as e:
         logger.error(f"DOCX 文本提取失败: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
         raise RuntimeError(f"无法解析 DOCX 文件。错误: {str(e)}")
 
 
+# 文本文件依次尝试的编码
+TEXT_ENCODINGS = ('utf-8', 'gbk', 'gb2312', 'latin-1')
+# 探测编码时试解码的前缀长度
+_ENCODING_PROBE_SIZE = 64 * 1024
+
+
+def read_file_bytes(file_path):
+    """一次性读取文件的全部字节"""
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+
+def decode_text_bytes(raw):
+    """
+    依次尝试多种编码解码字节内容
+
+    Args:
+        raw: 文件字节内容
+
+    Returns:
+        解码后的文本（全部失败时按 UTF-8 忽略错误解码；换行符由 clean_script_text 统一）
+    """
+    for encoding in TEXT_ENCODINGS:
+        try:
+            # 先用增量解码器试解前 64KB（允许截断在多字节字符中间），不匹配的编码尽早淘汰
+            codecs.getincrementaldecoder(encoding)().decode(raw[:_ENCODING_PROBE_SIZE], final=False)
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+
+    return raw.decode('utf-8', errors='ignore')
+
+
 def extract_text_from_file(file_path, file_ext):
     """根据文件类型提取文本"""
     if file_ext == 'pdf':
-        return extract_text_from_pdf(file_path)
+        return clean_script_text(extract_text_from_pdf(file_path))
     elif file_ext == 'docx':
         return extract_text_from_docx(file_path)
     else:
-        # txt 文件读取，尝试多种编码
-        text = None
-        encodings = ['utf-8', 'gbk', 'gb2312', 'latin-1']
-        for encoding in encodings:
-            try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    text = f.read()
-                break
-            except UnicodeDecodeError:
-                continue
-
-        # 如果都失败，使用 errors='ignore'
-        if text is None:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                text = f.read()
+        # txt 文件只读取一次字节内容，再依次尝试多种编码解码
+        text = decode_text_bytes(read_file_bytes(file_path))
 
         # 清理和规范化文本
         text = clean_script_text(text)
@@ -249,12 +460,10 @@ def validate_and_fix_text(text: str) -> str:
     Returns:
         验证和修复后的文本
     """
-    import re
-
     # 检查文本是否包含过多乱码字符
     total_chars = len(text)
-    chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', text))
-    english_chars = len(re.findall(r'[a-zA-Z]', text))
+    chinese_chars = len(_CHINESE_CHAR_RE.findall(text))
+    english_chars = len(_ENGLISH_CHAR_RE.findall(text))
     valid_chars = chinese_chars + english_chars
 
     # 如果有效字符比例过低，可能是乱码
@@ -262,14 +471,39 @@ def validate_and_fix_text(text: str) -> str:
         logger.warning(f"文本质量检查: 有效字符比例 {valid_chars/total_chars:.2%}，可能存在乱码")
         # 尝试更激进的清理
         # 只保留中文、英文、数字和常用标点
-        text = re.sub(r'[^\u4e00-\u9fffa-zA-Z0-9\s\.,!?;:：，。！？；、()\[\]""''《》·—\-–—/]', '', text)
+        text = _AGGRESSIVE_CLEAN_RE.sub('', text)
         # 移除多余空白
-        text = re.sub(r'\s+', ' ', text)
+        text = _WHITESPACE_RE.sub(' ', text)
         logger.info("已应用激进清理模式，移除了可疑字符")
 
     return text
 
 
+# 超过 500 字符的单行（按行匹配，避免逐行拆分整个文本）
+_LONG_LINE_RE = re.compile(r'^[^\n]{501,}$', re.MULTILINE)
+# 长行尾部出现这些字符时视为正常行，不做分割
+_END_PUNCT_RE = re.compile(r'[。！？.!?】]')
+
+
+def _split_long_line(line: str) -> str:
+    """
+    将缺少句末标点的超长单行按标点拆成多行
+
+    Args:
+        line: 单行文本（长度已超过 500 字符）
+
+    Returns:
+        处理后的文本（可能包含换行）
+    """
+    # 如果单行超过500字符且没有标点，可能是格式错误，尝试分割
+    if _END_PUNCT_RE.search(line, len(line) - 100):
+        return line
+
+    # 按标点分割：在每个句末标点后插入换行
+    new_line, count = _SPLIT_RE.subn(r'\1\n', line)
+    return new_line.strip() if count else line
+
+
 def clean_script_text(text: str) -> str:
     """
     清理和规范化剧本文本
@@ -280,62 +514,32 @@ def clean_script_text(text: str) -> str:
     Returns:
         清理后的文本
     """
-    import re
+    # 1. 移除 BOM 标记、统一换行符、全角空格转半角
+    # \r\n 需先合并，否则单独映射 \r 会在每行之间多出一个空行
+    text = text.replace('\r\n', '\n').translate(_NORMALIZE_TRANS)
 
-    # 1. 移除 BOM 标记
-    text = text.replace('\ufeff', '')
+    # 2. 移除连续的空行（保留最多一个空行）
+    text = _BLANK_RE.sub('\n\n', text)
 
-    # 2. 统一换行符
-    text = text.replace('\r\n', '\n').replace('\r', '\n')
-
-    # 3. 移除连续的空行（保留最多一个空行）
-    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
-
-    # 4. 清理行首行尾空白
+    # 3. 清理行首行尾空白
     lines = [line.rstrip() for line in text.split('\n')]
     text = '\n'.join(lines)
 
-    # 5. 移除全角空格和半角空格的混合
-    text = text.replace('\u3000', ' ')  # 全角空格转半角
-
-    # 6. 移除不可见字符（保留换行、制表符、常用标点）
+    # 4. 移除不可见字符（保留换行、制表符、常用标点）
     # 保留中文、英文、数字、常用标点、换行符
-    text = re.sub(r'[^\u4e00-\u9fff\u3400-\u4dbfa-zA-Z0-9\s\.,!?;:：，。！？；、()\[\]""''《》·—·…～–—/=@#\\%^&*+|{}<>\n\r\t]', '', text)
+    text = text.translate(_CLEAN_TABLE)
 
-    # 7. 修复常见的格式问题
+    # 5. 修复常见的格式问题
     # 修复括号不匹配问题（移除孤立的括号）
-    text = re.sub(r'【([^】]*$)', r'【\1】', text)  # 缺失的右括号
-
-    # 8. 移除过长的单行（可能是格式错误）
-    lines = text.split('\n')
-    cleaned_lines = []
-    for line in lines:
-        # 如果单行超过500字符且没有标点，可能是格式错误，尝试分割
-        if len(line) > 500 and not any(punct in line[-100:] for punct in ['。', '！', '？', '.', '!', '?', '】']):
-            # 尝试按标点分割
-            parts = re.split(r'([。！？\.!?])', line)
-            if len(parts) > 1:
-                # 重组句子
-                new_line = ''
-                for i in range(0, len(parts) - 1, 2):
-                    if i + 1 < len(parts):
-                        new_line += parts[i] + parts[i + 1] + '\n'
-                    else:
-                        new_line += parts[i]
-                if parts[-1]:
-                    new_line += parts[-1]
-                cleaned_lines.append(new_line.strip())
-            else:
-                cleaned_lines.append(line)
-        else:
-            cleaned_lines.append(line)
+    text = _UNCLOSED_BRACKET_RE.sub(r'【\1】', text)  # 缺失的右括号
 
-    text = '\n'.join(cleaned_lines)
+    # 6. 移除过长的单行（可能是格式错误）
+    text = _LONG_LINE_RE.sub(lambda m: _split_long_line(m.group()), text)
 
-    # 9. 最终清理多余的空行
-    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
+    # 7. 最终清理多余的空行
+    text = _BLANK_RE.sub('\n\n', text)
 
-    # 10. 记录清理信息
+    # 8. 记录清理信息
     original_len = len(text)
     logger.info(f"文本清理完成: 原始 {original_len} 字符 -> 最终 {len(text)} 字符")
 
@@ -357,8 +561,7 @@ def index():
 def get_dimensions():
     """获取所有评测维度"""
     try:
-        evaluator = ScriptEvaluator()
-        dimensions = evaluator.config.get('evaluation_dimensions', {})
+        dimensions = load_evaluation_config().get('evaluation_dimensions', {})
 
         result = []
         for key, config in dimensions.items():
@@ -383,80 +586,39 @@ def get_dimensions():
         }), 500
 
 
-@app.route('/api/evaluate', methods=['POST'])
-def evaluate():
-    """评测剧本"""
-    try:
-        # 检查文件
-        if 'file' not in request.files:
-            return jsonify({
-                'success': False,
-                'error': '未上传文件'
-            }), 400
-
-        file = request.files['file']
-
-        if file.filename == '':
-            return jsonify({
-                'success': False,
-                'error': '未选择文件'
-            }), 400
-
-        if not allowed_file(file.filename):
-            return jsonify({
-                'success': False,
-                'error': '只支持 .txt、.pdf、.docx 格式的剧本文件'
-            }), 400
-
-        # 获取选中的维度
-        dimensions = request.form.get('dimensions')
-        dimension_list = dimensions.split(',') if dimensions else None
-
-        # 保存原始文件名（用于显示）
-        original_filename = file.filename.rsplit('.', 1)[0] if '.' in file.filename else file.filename
-
-        # 保存文件（使用 secure_filename 处理，避免文件系统问题）
-        filename = secure_filename(file.filename)
-        file_id = str(uuid.uuid4())[:8]
-        script_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{file_id}_{filename}")
-        file.save(script_path)
-
-        # 如果是 PDF 文件，先转换为文本
-        file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
-        temp_txt_path = None
-        actual_script_path = script_path
-
-        if file_ext == 'pdf':
-            try:
-                # 提取 PDF 文本
-                text_content = extract_text_from_file(script_path, file_ext)
+def _run_evaluation(script_path, script_text, dimension_list, original_filename):
+    """
+    执行评测、生成报告并保存历史记录
 
-                # 保存为临时 txt 文件
-                temp_txt_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{file_id}_{filename}.txt")
-                with open(temp_txt_path, 'w', encoding='utf-8') as f:
-                    f.write(text_content)
+    既用于同步请求，也用于后台评测任务；结束后清理上传的临时文件。
 
-                actual_script_path = temp_txt_path
-            except Exception as e:
-                # 清理文件
-                try:
-                    os.remove(script_path)
-                except:
-                    pass
-                raise RuntimeError(f"PDF 文件解析失败: {str(e)}")
+    Args:
+        script_path: 上传文件保存路径
+        script_text: 已提取的剧本文本（PDF），为 None 时由评测器读取上传文件
+        dimension_list: 评测维度列表
+        original_filename: 原始文件名（用于显示）
 
+    Returns:
+        评测结果
+    """
+    try:
         # 执行评测
         logger.info("=" * 60)
         logger.info(f"📝 开始评测剧本: {original_filename}")
         logger.info(f"📊 评测维度: {dimension_list}")
-        logger.info(f"📄 剧本路径: {actual_script_path}")
+        logger.info(f"📄 剧本路径: {script_path}")
         logger.info("=" * 60)
 
-        evaluator = ScriptEvaluator()
+        evaluator = get_evaluator()
 
         # 开始评测（显示进度）
         logger.info("⏳ 正在初始化评测...")
-        result = evaluator.evaluate(actual_script_path, dimensions=dimension_list, show_progress=True)
+        if script_text is not None:
+            result = evaluator.evaluate_text(script_text, script_name=original_filename,
+                                             dimensions=dimension_list, show_progress=True,
+                                             script_path=script_path)
+        else:
+            result = evaluator.evaluate(script_path, dimensions=dimension_list, show_progress=True)
 
         logger.info("=" * 60)
         logger.info("✅ 评测完成，准备生成报告")
@@ -472,7 +634,7 @@ def evaluate():
         # 预检查：验证数据是否可序列化
         logger.info("验证数据可序列化...")
         try:
-            json.dumps(result)
+            orjson.dumps(result, option=orjson.OPT_NON_STR_KEYS)
             logger.info("数据序列化检查通过")
         except Exception as e:
             logger.error(f"数据序列化失败: {e}")
@@ -480,17 +642,19 @@ def evaluate():
             result_clean = {}
             for key, value in result.items():
                 try:
-                    json.dumps({key: value})
+                    orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
                     result_clean[key] = value
                 except:
                     logger.warning(f"跳过无法序列化的字段: {key}")
             result = result_clean
 
-        report_files = report_generator.generate(result, formats=['markdown', 'json', 'pdf'])
+        reports = report_generator.generate_with_contents(result, formats=['markdown', 'json', 'pdf'])
+        report_files = [path for path, _ in reports]
         logger.info(f"报告生成完成: {report_files}")
 
         # 获取报告文件名（用于下载）
         result['report_files'] = [os.path.basename(f) for f in report_files]
+        _cache_reports(reports)
 
         # 保存历史记录
         try:
@@ -502,46 +666,228 @@ def evaluate():
         except Exception as e:
             logger.error(f"保存历史记录失败: {str(e)}")
 
+        return result
+    finally:
         # 清理上传的临时文件
         logger.info("清理临时文件...")
         try:
-            os.remove(script_path)
-            if temp_txt_path and os.path.exists(temp_txt_path):
-                os.remove(temp_txt_path)
+            if script_path:
+                os.remove(script_path)
         except:
             pass
 
-        logger.info("准备返回响应...")
-        logger.info(f"响应数据大小估算: {len(str(result))} 字符")
 
-        # 构建响应数据
-        response_data = {
-            'success': True,
-            'result': result
+def _cache_reports(reports):
+    """
+    把刚生成的文本报告内容放入内存缓存，超出容量时淘汰最久未使用的报告
+
+    Args:
+        reports: 报告生成器返回的 (文件路径, 文本内容) 列表
+    """
+    with _report_cache_lock:
+        for report_path, content in reports:
+            if content is None or not report_path.endswith(_REPORT_CACHE_SUFFIXES):
+                continue
+            key = os.path.basename(report_path)
+            _report_cache[key] = content
+            _report_cache.move_to_end(key)
+        while len(_report_cache) > _REPORT_CACHE_SIZE:
+            _report_cache.popitem(last=False)
+
+
+def _get_cached_report(filename):
+    """从缓存获取报告内容（按文件名的 basename 查找，与写入时一致），未命中返回 None"""
+    key = os.path.basename(filename)
+    with _report_cache_lock:
+        content = _report_cache.get(key)
+        if content is not None:
+            _report_cache.move_to_end(key)
+        return content
+
+
+def _run_evaluation_job(job_id, *args):
+    """后台线程中执行评测任务并记录状态"""
+    _update_evaluation_job(job_id, status='running')
+    try:
+        result = _run_evaluation(*args)
+        _update_evaluation_job(job_id, status='finished', result=result)
+    except Exception as e:
+        logger.error(f"后台评测任务 {job_id} 失败: {str(e)}")
+        logger.error(traceback.format_exc())
+        _update_evaluation_job(job_id, status='failed', error=str(e))
+
+
+def _update_evaluation_job(job_id, **fields):
+    """更新评测任务状态"""
+    with _evaluation_jobs_lock:
+        job = _evaluation_jobs.get(job_id)
+        if job is not None:
+            job.update(fields)
+
+
+def _create_evaluation_job(script_name):
+    """创建评测任务记录，超出上限时丢弃最早的任务"""
+    job_id = uuid.uuid4().hex
+    with _evaluation_jobs_lock:
+        _evaluation_jobs[job_id] = {
+            'job_id': job_id,
+            'status': 'queued',
+            'script_name': script_name,
+            'created_at': datetime.now().isoformat()
         }
+        while len(_evaluation_jobs) > _MAX_EVALUATION_JOBS:
+            _evaluation_jobs.popitem(last=False)
+    return job_id
+
+
+def _parse_upload_filename(raw_filename):
+    """
+    解析上传文件名，得到扩展名和用于显示的原始文件名
+
+    只解析一次原始文件名，扩展名和显示名都从这里取
+    （secure_filename 会去掉中文等字符，可能连扩展名前的点一起丢失，因此不能从它取扩展名）
+
+    Returns:
+        (小写扩展名, 显示用文件名)
+    """
+    name_stem, has_ext, raw_ext = raw_filename.rpartition('.')
+    if not has_ext:
+        return '', raw_filename
+    return raw_ext.lower(), name_stem
+
+
+def _prepare_uploaded_script(stream, raw_filename, file_ext):
+    """
+    处理上传的剧本数据流：所有格式都流式落盘，PDF 额外提取文本
 
-        logger.info("构建 JSON 响应...")
-        logger.info(f"响应键: {list(response_data.keys())}")
-        logger.info(f"结果键: {list(result.keys())}")
+    TXT 不在这里解码，由评测器按与命令行相同的方式只读取文件开头所需的部分，
+    两条路径得到的剧本内容（以及结果缓存键）一致，也不会把整个上传体读入内存。
 
-        # 尝试序列化
+    Args:
+        stream: 上传文件数据流
+        raw_filename: 原始文件名
+        file_ext: 小写扩展名
+
+    Returns:
+        (script_path, script_text)
+    """
+    script_text = None
+
+    # 保存文件（使用 secure_filename 处理，避免文件系统问题）
+    filename = secure_filename(raw_filename)
+    file_id = uuid.uuid4().hex[:8]
+    script_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{file_id}_{filename}")
+    save_upload_file(stream, script_path)
+
+    # 如果是 PDF 文件，先提取文本，直接在内存中交给评测器
+    if file_ext == 'pdf':
         try:
-            json_response = jsonify(response_data)
-            logger.info("JSONify 成功，准备返回")
-            return json_response
+            # 提取 PDF 文本
+            script_text = extract_text_from_file(script_path, file_ext)
         except Exception as e:
-            logger.error(f"JSONify 失败: {e}")
-            logger.error(traceback.format_exc())
-            # 返回简化版本
-            simple_response = {
-                'success': True,
-                'result': {
-                    'script_name': result.get('script_name', ''),
-                    'overall': result.get('overall', {}),
-                    'report_files': result.get('report_files', [])
-                }
+            # 清理文件
+            try:
+                os.remove(script_path)
+            except:
+                pass
+            raise RuntimeError(f"PDF 文件解析失败: {str(e)}")
+
+    return script_path, script_text
+
+
+def _evaluation_response(script_path, script_text, dimension_list, original_filename, async_mode):
+    """
+    执行（或提交后台）评测并构建响应
+
+    Args:
+        script_path: 上传文件保存路径
+        script_text: 已提取的剧本文本（PDF，其余格式为 None）
+        dimension_list: 评测维度列表
+        original_filename: 原始文件名（用于显示）
+        async_mode: 是否以后台任务方式执行
+    """
+    run_args = (script_path, script_text, dimension_list, original_filename)
+
+    # 后台模式：提交任务后立即返回任务 ID，客户端轮询 /api/jobs/<job_id>
+    if async_mode:
+        job_id = _create_evaluation_job(original_filename)
+        _evaluation_executor.submit(_run_evaluation_job, job_id, *run_args)
+        logger.info(f"评测任务已提交: {job_id}")
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status': 'queued'
+        }), 202
+
+    result = _run_evaluation(*run_args)
+
+    logger.info("准备返回响应...")
+
+    # 构建响应数据
+    response_data = {
+        'success': True,
+        'result': result
+    }
+
+    logger.info("构建 JSON 响应...")
+    logger.info(f"响应键: {list(response_data.keys())}")
+    logger.info(f"结果键: {list(result.keys())}")
+
+    # 一次序列化直接生成响应体（无法序列化的值转为字符串）
+    try:
+        body = orjson.dumps(response_data, default=str, option=orjson.OPT_NON_STR_KEYS)
+        logger.info(f"JSON 序列化成功，响应大小: {len(body)} 字节")
+        return Response(body, mimetype='application/json')
+    except Exception as e:
+        logger.error(f"JSON 序列化失败: {e}")
+        logger.error(traceback.format_exc())
+        # 返回简化版本
+        simple_response = {
+            'success': True,
+            'result': {
+                'script_name': result.get('script_name', ''),
+                'overall': result.get('overall', {}),
+                'report_files': result.get('report_files', [])
             }
-            return jsonify(simple_response)
+        }
+        return jsonify(simple_response)
+
+
+@app.route('/api/evaluate', methods=['POST'])
+def evaluate():
+    """评测剧本"""
+    try:
+        # 检查文件
+        if 'file' not in request.files:
+            return jsonify({
+                'success': False,
+                'error': '未上传文件'
+            }), 400
+
+        file = request.files['file']
+
+        if file.filename == '':
+            return jsonify({
+                'success': False,
+                'error': '未选择文件'
+            }), 400
+
+        file_ext, original_filename = _parse_upload_filename(file.filename)
+
+        if not allowed_file(file_ext):
+            return jsonify({
+                'success': False,
+                'error': '只支持 .txt、.pdf、.docx 格式的剧本文件'
+            }), 400
+
+        # 获取选中的维度
+        dimensions = request.form.get('dimensions')
+        dimension_list = dimensions.split(',') if dimensions else None
+
+        script_path, script_text = _prepare_uploaded_script(file.stream, file.filename, file_ext)
+
+        return _evaluation_response(script_path, script_text, dimension_list, original_filename,
+                                    async_mode=is_truthy_flag(request.form.get('async')))
 
     except Exception as e:
         logger.error(f"Error in evaluate: {str(e)}")
@@ -553,12 +899,94 @@ def evaluate():
         }), 500
 
 
+@app.route('/api/evaluate/stream', methods=['POST'])
+def evaluate_stream():
+    """
+    以原始请求体上传剧本并评测（跳过 multipart 表单解析）
+
+    请求体为文件原始字节（Content-Type: application/octet-stream），
+    文件名、维度和 async 通过查询参数传递。请求体按块流式写入上传目录，
+    不会整体读入内存（见 _prepare_uploaded_script）。
+    """
+    try:
+        raw_filename = request.args.get('filename', '')
+        if not raw_filename:
+            return jsonify({
+                'success': False,
+                'error': '缺少 filename 参数'
+            }), 400
+
+        file_ext, original_filename = _parse_upload_filename(raw_filename)
+
+        if not allowed_file(file_ext):
+            return jsonify({
+                'success': False,
+                'error': '只支持 .txt、.pdf、.docx 格式的剧本文件'
+            }), 400
+
+        dimensions = request.args.get('dimensions')
+        dimension_list = dimensions.split(',') if dimensions else None
+
+        script_path, script_text = _prepare_uploaded_script(request.stream, raw_filename, file_ext)
+
+        return _evaluation_response(script_path, script_text, dimension_list, original_filename,
+                                    async_mode=is_truthy_flag(request.args.get('async')))
+
+    except Exception as e:
+        logger.error(f"Error in evaluate_stream: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'trace': traceback.format_exc()
+        }), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_evaluation_job(job_id):
+    """查询后台评测任务状态"""
+    with _evaluation_jobs_lock:
+        job = _evaluation_jobs.get(job_id)
+        job = dict(job) if job is not None else None
+
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': '任务不存在'
+        }), 404
+
+    return jsonify({
+        'success': True,
+        **job
+    })
+
+
 @app.route('/api/reports/<filename>', methods=['GET'])
 def get_report(filename):
-    """获取报告文件"""
+    """
+    获取报告文件
+
+    默认直接返回文件内容（send_file 流式发送，支持 ETag / If-Modified-Since）；
+    json=1 时返回 {'success': True, 'content': ...} 格式。
+    """
     try:
+        as_json = is_truthy_flag(request.args.get('json'))
+
+        # 优先从内存缓存返回刚生成的报告（缓存键为原始文件名；secure_filename 会去掉中文，不能用于查缓存）
+        content = _get_cached_report(filename)
+        if content is not None:
+            if as_json:
+                return jsonify({
+                    'success': True,
+                    'content': content
+                })
+            return Response(content, mimetype=_REPORT_MIMETYPES.get(os.path.splitext(filename)[1], 'text/plain'))
+
         report_path = os.path.join(app.config['OUTPUT_FOLDER'], secure_filename(filename))
         if os.path.exists(report_path):
+            if not as_json:
+                return send_file(report_path, as_attachment=False, conditional=True)
+
             with open(report_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             return jsonify({
@@ -581,9 +1009,6 @@ def get_report(filename):
 def get_config():
     """获取配置信息"""
     try:
-        from dotenv import load_dotenv
-        load_dotenv()
-
         model_endpoint = os.getenv("MODEL_ENDPOINT", "")
         base_url = os.getenv("ARK_BASE_URL", "")
 
@@ -633,8 +1058,7 @@ def improve_script():
         prompt = build_improve_prompt(original_script_name, suggestions, evaluation_result, original_script_content)
 
         # 记录提示词中的集数要求，用于调试
-        import re
-        episode_match = re.search(r'原剧本共有 (\d+) 集', prompt)
+        episode_match = _PROMPT_EPISODE_COUNT_RE.search(prompt)
         if episode_match:
             detected_episodes = episode_match.group(1)
             logger.info(f"📊 改进剧本: {original_script_name}, 要求集数: {detected_episodes}集")
@@ -642,7 +1066,6 @@ def improve_script():
         logger.info(f"开始根据建议改进剧本: {original_script_name}")
 
         # 调用 API 生成改进后的剧本
-        from src.api_client import DoubaoAPIClient
         api_client = DoubaoAPIClient()
 
         system_prompt = """你是一位专业的短剧编剧，擅长根据反馈意见改进剧本。
@@ -681,71 +1104,8 @@ def improve_script():
         }), 500
 
 
-def build_improve_prompt(script_name, suggestions, evaluation_result, original_script_content=""):
-    """
-    构建剧本改进的提示词
-
-    Args:
-        script_name: 原剧本名称
-        suggestions: 各维度的修改建议
-        evaluation_result: 完整的评测结果
-        original_script_content: 原剧本完整内容
-
-    Returns:
-        完整的提示词
-    """
-
-    # 尝试从原剧本内容中检测集数
-    episode_count = 0  # 默认为0，确保是整数
-    if original_script_content:
-        # 检测常见的集数标记模式
-        import re
-
-        # 方法1: 匹配 "第X集"、"第 X 集"、"Episode X" 等模式
-        episode_patterns = [
-            r'第(\d+)集',
-            r'第\s*(\d+)\s*集',
-            r'Episode\s*(\d+)',
-            r'EP[.\s]*(\d+)',
-            r'第(\d+)章',
-            r'第\s*(\d+)\s*章'
-        ]
-        episodes_found = []
-        for pattern in episode_patterns:
-            matches = re.findall(pattern, original_script_content, re.IGNORECASE)
-            if matches:
-                episodes_found.extend([int(m) for m in matches])
-
-        # 方法2: 检测"分集剧本"部分后的数字行（格式如："1"、"2"、"3"等）
-        if not episodes_found:
-            # 查找"分集剧本"之后的内容
-            episode_section_match = re.search(r'分集剧本\s*(.*?)(?=\n\s*\n|\Z)', original_script_content, re.DOTALL)
-            if episode_section_match:
-                episode_section = episode_section_match.group(1)
-                # 匹配独立的数字行（集数标记）
-                standalone_numbers = re.findall(r'^(\d+)$', episode_section, re.MULTILINE)
-                if standalone_numbers:
-                    episodes_found.extend([int(n) for n in standalone_numbers])
-
-        # 方法3: 直接统计所有独立的数字行（作为后备方案）
-        if not episodes_found:
-            standalone_numbers = re.findall(r'^(\d+)$', original_script_content, re.MULTILINE)
-            # 过滤掉可能是页码或其他数字的行（通常是连续的数字，如1,2,3...）
-            if standalone_numbers:
-                # 去重并排序
-                unique_numbers = sorted(set([int(n) for n in standalone_numbers]))
-                # 如果有连续的数字序列（1,2,3...），取最大的
-                if len(unique_numbers) > 1:
-                    episodes_found = unique_numbers
-
-        if episodes_found:
-            episode_count = max(episodes_found)  # 取最大的集数
-
-    # 如果检测失败，至少设置为默认值20
-    if episode_count == 0:
-        episode_count = 20
-
-    prompt = f"""⚠️⚠️⚠️ 重要：原剧本共有 {episode_count} 集，改进后的剧本必须是 {episode_count} 集 ⚠️⚠️⚠️
+# 剧本改进提示词的固定模板（头部：要求、格式模板和原剧本；尾部：输出要求）
+_IMPROVE_PROMPT_HEADER = """⚠️⚠️⚠️ 重要：原剧本共有 {episode_count} 集，改进后的剧本必须是 {episode_count} 集 ⚠️⚠️⚠️
 
 请根据以下评测建议，改进剧本《{script_name}》。
 
@@ -824,25 +1184,7 @@ ending: [结局内容]
 
 """
 
-    # 添加各维度的修改建议
-    for dim_key, dim_data in suggestions.items():
-        dimension_name = dim_data.get('dimension_name', dim_key)
-        dim_suggestions = dim_data.get('suggestions', [])
-
-        if dim_suggestions:
-            prompt += f"\n### {dimension_name}\n\n"
-            for i, suggestion in enumerate(dim_suggestions, 1):
-                prompt += f"{i}. {suggestion}\n"
-            prompt += "\n"
-
-    # 添加原剧本的总体信息（如果有的话）
-    if evaluation_result.get('overall'):
-        overall = evaluation_result['overall']
-        prompt += f"\n## 原剧本评测概要\n\n"
-        prompt += f"- 总分：{overall.get('total_score', 0)}/{overall.get('max_score', 100)}\n"
-        prompt += f"- 等级：{overall.get('grade', 'N/A')}\n\n"
-
-    prompt += f"""
+_IMPROVE_PROMPT_FOOTER = """
 
 ## 📋 输出要求（必须严格遵守，不可违反）
 
@@ -860,7 +1202,7 @@ ending: [结局内容]
 
 🚨🚨🚨 超级重要（违反将被视为失败）🚨🚨🚨：
 
-1. **集数必须准确**：必须是 {episode_count} 集，不能是 {episode_count - 1} 集、{episode_count - 2} 集或 {episode_count + 1} 集
+1. **集数必须准确**：必须是 {episode_count} 集，不能是 {episode_count_minus_1} 集、{episode_count_minus_2} 集或 {episode_count_plus_1} 集
 2. **每集必须完整**：每一集都必须包含完整的6个要素（时长、场景、影视化画面提示、第一人称旁白、动作/事件、结尾钩子）
 3. **不要省略中间集数**：如果原剧本有{episode_count}集，就不要输出"1...10"然后跳到"{episode_count}"，必须输出1到{episode_count}每一集
 4. **格式符号一致**：【时长】：、【场景】：、【第一人称旁白(OS)】：、【动作 / 事件】：、【结尾钩子】：
@@ -878,7 +1220,92 @@ ending: [结局内容]
 
 请直接输出改进后的剧本内容，不要添加任何额外的解释说明或开场白。"""
 
-    return prompt
+
+def build_improve_prompt(script_name, suggestions, evaluation_result, original_script_content=""):
+    """
+    构建剧本改进的提示词
+
+    Args:
+        script_name: 原剧本名称
+        suggestions: 各维度的修改建议
+        evaluation_result: 完整的评测结果
+        original_script_content: 原剧本完整内容
+
+    Returns:
+        完整的提示词
+    """
+
+    # 尝试从原剧本内容中检测集数
+    episode_count = 0  # 默认为0，确保是整数
+    if original_script_content:
+        # 检测常见的集数标记模式
+        # 方法1: 匹配 "第X集"、"第 X 集"、"Episode X" 等模式
+        episodes_found = [
+            int(match.group(match.lastindex))
+            for match in _EPISODE_RE.finditer(original_script_content)
+        ]
+
+        # 方法2: 检测"分集剧本"部分后的数字行（格式如："1"、"2"、"3"等）
+        if not episodes_found:
+            # 查找"分集剧本"之后的内容
+            episode_section_match = _EPISODE_SECTION_RE.search(original_script_content)
+            if episode_section_match:
+                episode_section = episode_section_match.group(1)
+                # 匹配独立的数字行（集数标记）
+                standalone_numbers = _STANDALONE_NUMBER_RE.findall(episode_section)
+                if standalone_numbers:
+                    episodes_found.extend([int(n) for n in standalone_numbers])
+
+        # 方法3: 直接统计所有独立的数字行（作为后备方案）
+        if not episodes_found:
+            standalone_numbers = _STANDALONE_NUMBER_RE.findall(original_script_content)
+            # 过滤掉可能是页码或其他数字的行（通常是连续的数字，如1,2,3...）
+            if standalone_numbers:
+                # 去重并排序
+                unique_numbers = sorted(set([int(n) for n in standalone_numbers]))
+                # 如果有连续的数字序列（1,2,3...），取最大的
+                if len(unique_numbers) > 1:
+                    episodes_found = unique_numbers
+
+        if episodes_found:
+            episode_count = max(episodes_found)  # 取最大的集数
+
+    # 如果检测失败，至少设置为默认值20
+    if episode_count == 0:
+        episode_count = 20
+
+    # 固定模板只做一次格式化，各维度建议按列表拼接
+    template_values = {
+        'episode_count': episode_count,
+        'episode_count_minus_1': episode_count - 1,
+        'episode_count_minus_2': episode_count - 2,
+        'episode_count_plus_1': episode_count + 1,
+        'script_name': script_name,
+        'original_script_content': original_script_content,
+    }
+    parts = [_IMPROVE_PROMPT_HEADER.format(**template_values)]
+
+    # 添加各维度的修改建议
+    for dim_key, dim_data in suggestions.items():
+        dimension_name = dim_data.get('dimension_name', dim_key)
+        dim_suggestions = dim_data.get('suggestions', [])
+
+        if dim_suggestions:
+            parts.append(f"\n### {dimension_name}\n\n")
+            for i, suggestion in enumerate(dim_suggestions, 1):
+                parts.append(f"{i}. {suggestion}\n")
+            parts.append("\n")
+
+    # 添加原剧本的总体信息（如果有的话）
+    if evaluation_result.get('overall'):
+        overall = evaluation_result['overall']
+        parts.append("\n## 原剧本评测概要\n\n")
+        parts.append(f"- 总分：{overall.get('total_score', 0)}/{overall.get('max_score', 100)}\n")
+        parts.append(f"- 等级：{overall.get('grade', 'N/A')}\n\n")
+
+    parts.append(_IMPROVE_PROMPT_FOOTER.format(**template_values))
+
+    return "".join(parts)
 
 
 # ==================== 历史记录 API ====================
@@ -890,8 +1317,9 @@ def get_history():
         limit = request.args.get('limit', 20, type=int)
         offset = request.args.get('offset', 0, type=int)
         search = request.args.get('search', None)
+        cursor = request.args.get('cursor', None)
 
-        result = history_manager.get_records(limit=limit, offset=offset, search=search)
+        result = history_manager.get_records(limit=limit, offset=offset, search=search, cursor=cursor)
 
         return jsonify({
             'success': True,
@@ -1155,9 +1583,6 @@ def download_novel(record_id):
             filename = f"{record_id}.txt"
 
         # 返回文件
-        from flask import send_file
-        import io
-
         buffer = io.BytesIO(full_content.encode('utf-8'))
         return send_file(
             buffer,
@@ -1571,12 +1996,49 @@ def improve_novel():
         }), 500
 
 
+def run_server(port, debug=False, dev=False):
+    """
+    启动 Web 服务
+
+    默认使用 gunicorn（多线程 worker，PDF 解析等耗时请求不会阻塞其它接口）；
+    调试模式、--dev 或未安装 gunicorn 时回退到 Flask 开发服务器。
+    后台评测任务、报告缓存都保存在进程内存中，因此 worker 进程数默认为 1，
+    可通过 WEB_WORKERS / WEB_THREADS 环境变量调整。
+
+    Args:
+        port: 监听端口
+        debug: 是否启用调试模式
+        dev: 是否强制使用 Flask 开发服务器
+    """
+    if not (debug or dev):
+        try:
+            from gunicorn.app.base import BaseApplication
+        except ImportError:
+            logger.warning("未安装 gunicorn，使用 Flask 开发服务器")
+        else:
+            class _GunicornApplication(BaseApplication):
+                def load_config(self):
+                    self.cfg.set('bind', f'0.0.0.0:{port}')
+                    self.cfg.set('workers', int(os.getenv('WEB_WORKERS', '1')))
+                    self.cfg.set('threads', int(os.getenv('WEB_THREADS', '8')))
+                    self.cfg.set('timeout', int(os.getenv('WEB_TIMEOUT', '300')))
+
+                def load(self):
+                    return app
+
+            _GunicornApplication().run()
+            return
+
+    app.run(debug=debug, host='0.0.0.0', port=port, threaded=True)
+
+
 if __name__ == '__main__':
     import argparse
 
     parser = argparse.ArgumentParser(description='AI 剧本评测系统 Web 服务')
     parser.add_argument('--port', '-p', type=int, default=None, help='指定端口号（默认自动查找可用端口）')
     parser.add_argument('--debug', '-d', action='store_true', help='启用调试模式')
+    parser.add_argument('--dev', action='store_true', help='使用 Flask 开发服务器（默认优先使用 gunicorn）')
     args = parser.parse_args()
 
     # 默认端口列表（按优先级）
@@ -1584,22 +2046,27 @@ if __name__ == '__main__':
 
     if args.port:
         port = args.port
-        app.run(debug=args.debug, host='0.0.0.0', port=port)
+        run_server(port, debug=args.debug, dev=args.dev)
     else:
         # 自动查找可用端口
         import socket
 
         port_found = False
         for try_port in default_ports:
+            # 直接尝试绑定端口，比 connect_ex 探测更准确（TIME_WAIT/防火墙过滤时不会误判）
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                if s.connect_ex(('localhost', try_port)) != 0:
-                    port = try_port
-                    port_found = True
-                    print(f"\n🚀 启动 Web 服务")
-                    print(f"📍 访问地址: http://localhost:{port}")
-                    print(f"📝 按 Ctrl+C 停止服务\n")
-                    app.run(debug=args.debug, host='0.0.0.0', port=port)
-                    break
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                try:
+                    s.bind(('0.0.0.0', try_port))
+                except OSError:
+                    continue
+            port = try_port
+            port_found = True
+            print(f"\n🚀 启动 Web 服务")
+            print(f"📍 访问地址: http://localhost:{port}")
+            print(f"📝 按 Ctrl+C 停止服务\n")
+            run_server(port, debug=args.debug, dev=args.dev)
+            break
 
         if not port_found:
             # 所有默认端口都被占用，使用随机端口
@@ -1612,4 +2079,4 @@ if __name__ == '__main__':
             print(f"\n🚀 启动 Web 服务")
             print(f"📍 访问地址: http://localhost:{port}")
             print(f"📝 按 Ctrl+C 停止服务\n")
-            app.run(debug=args.debug, host='0.0.0.0', port=port)
+            run_server(port, debug=args.debug, dev=args.dev)
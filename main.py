@@ -8,14 +8,36 @@ import sys
 import os
 import click
 import glob
+import fnmatch
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List
 
-# 添加 src 目录到路径
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from src.evaluator import ScriptEvaluator
-from src.report_generator import ReportGenerator
+def find_script_files(scripts_dir: str, pattern: str) -> List[str]:
+    """
+    查找目录下匹配模式的剧本文件
+
+    Args:
+        scripts_dir: 剧本文件所在目录
+        pattern: 文件名匹配模式
+
+    Returns:
+        匹配的文件路径列表
+    """
+    # 跨目录的模式（如 sub/*.txt）交给 glob 处理
+    if '/' in pattern or os.sep in pattern:
+        return glob.glob(os.path.join(scripts_dir, pattern))
+
+    # 单层目录直接用 scandir 遍历，文件类型来自目录项，无需逐个 stat；与 glob 一致，不匹配隐藏文件
+    match_hidden = pattern.startswith('.')
+    with os.scandir(scripts_dir) as entries:
+        return [
+            entry.path for entry in entries
+            if (match_hidden or not entry.name.startswith('.'))
+            and fnmatch.fnmatch(entry.name, pattern)
+            and entry.is_file()
+        ]
 
 
 @click.group()
@@ -45,6 +67,9 @@ def evaluate(script_path: str, dimensions: tuple, format: tuple, output: str):
     format_list = list(format)
 
     try:
+        from src.evaluator import ScriptEvaluator
+        from src.report_generator import ReportGenerator
+
         # 初始化评测器
         evaluator = ScriptEvaluator()
 
@@ -87,8 +112,7 @@ def batch(scripts_dir: str, pattern: str, dimensions: tuple, format: tuple, outp
     SCRIPTS_DIR: 剧本文件所在目录
     """
     # 查找剧本文件
-    search_pattern = os.path.join(scripts_dir, pattern)
-    script_files = glob.glob(search_pattern)
+    script_files = find_script_files(scripts_dir, pattern)
 
     if not script_files:
         click.echo(f"❌ 在目录 {scripts_dir} 中未找到匹配 {pattern} 的文件", err=True)
@@ -102,25 +126,42 @@ def batch(scripts_dir: str, pattern: str, dimensions: tuple, format: tuple, outp
     format_list = list(format)
 
     try:
+        from src.evaluator import ScriptEvaluator
+        from src.report_generator import ReportGenerator
+
         # 初始化评测器和报告生成器
         evaluator = ScriptEvaluator()
         report_generator = ReportGenerator(output_dir=output) if output else ReportGenerator()
 
-        results = []
+        # 并发评测多个剧本，全部完成后再并行生成各剧本的报告
+        ordered_results = [None] * len(script_files)
+        max_workers = max(1, min(len(script_files), int(os.getenv("EVAL_CONCURRENCY", "8"))))
 
-        # 逐个评测
-        with click.progressbar(script_files, label='评测进度') as bar:
-            for script_file in bar:
-                try:
-                    result = evaluator.evaluate(script_file, dimensions=dim_list, show_progress=False)
-                    results.append(result)
-
-                    # 生成单独报告
-                    report_generator.generate(result, formats=format_list)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+                click.progressbar(length=len(script_files), label='评测进度') as bar:
+            future_to_index = {
+                executor.submit(evaluator.evaluate, script_file, dimensions=dim_list, show_progress=False): i
+                for i, script_file in enumerate(script_files)
+            }
 
+            for future in as_completed(future_to_index):
+                index = future_to_index[future]
+                script_file = script_files[index]
+                try:
+                    ordered_results[index] = future.result()
                 except Exception as e:
                     click.echo(f"\n⚠️  评测 {script_file} 失败: {str(e)}", err=True)
-                    continue
+                finally:
+                    bar.update(1)
+
+        # 保持与文件列表一致的顺序
+        results = [r for r in ordered_results if r is not None]
+
+        # 并行生成单独报告
+        generated = report_generator.generate_many(results, formats=format_list)
+        for result, files in zip(results, generated):
+            if files is None:
+                click.echo(f"\n⚠️  生成 {result.get('script_name', 'unnamed')} 的报告失败", err=True)
 
         # 显示结果
         click.echo(f"\n✅ 批量评测完成! 共评测 {len(results)} 个剧本")
@@ -154,8 +195,13 @@ def batch(scripts_dir: str, pattern: str, dimensions: tuple, format: tuple, outp
 def list_dimensions():
     """列出所有可用的评测维度"""
     try:
-        evaluator = ScriptEvaluator()
-        dimensions = evaluator.config.get('evaluation_dimensions', {})
+        # 只读取配置文件，无需创建评测器（不要求配置 API 密钥）
+        import yaml
+
+        config_path = os.path.join(os.path.dirname(__file__), "config.yml")
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f)
+        dimensions = config.get('evaluation_dimensions', {})
 
         click.echo("📋 可用的评测维度:\n")
 
@@ -2,14 +2,10 @@
 """
 重新生成失败的评测报告
 """
-import sys
 import os
 import json
 from datetime import datetime
 
-# 添加src目录到路径
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
-
 from src.new_report_generator import NewReportGenerator
 
 def find_latest_evaluation():
@@ -4,15 +4,172 @@
 """
 
 import os
+import re
 import json
+import math
 import time
+import logging
+import orjson
+import sqlite3
+import hashlib
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Dict, List, Optional, Any
 from dotenv import load_dotenv
 
 # 加载环境变量
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# 响应缓存模式：enabled（命中则复用，未命中则请求并写入）、replay（只读缓存，未命中报错）、disabled（默认）
+_CACHE_MODES = ("enabled", "replay", "disabled")
+_DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".api_cache", "responses.sqlite3")
+
+
+class ResponseCache:
+    """基于 SQLite 的 API 响应缓存，key 为请求参数的 SHA256"""
+
+    def __init__(self, path: str = _DEFAULT_CACHE_PATH):
+        """
+        初始化响应缓存
+
+        Args:
+            path: SQLite 数据库文件路径
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        """根据请求 payload 计算缓存 key"""
+        data = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存的响应，不存在返回 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, response: Dict[str, Any]) -> None:
+        """写入响应"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(response, ensure_ascii=False), time.time())
+            )
+
+
+# 中日韩文字及全角标点，按每字约 1 个 token 估算；其余字符按约 4 个字符 1 个 token 估算
+_CJK_RUN_RE = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]+')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的 token 数（偏保守，用于限流配额）
+
+    Args:
+        text: 文本内容
+
+    Returns:
+        估算的 token 数
+    """
+    cjk_chars = sum(map(len, _CJK_RUN_RE.findall(text)))
+    return cjk_chars + (len(text) - cjk_chars + 3) // 4
+
+
+def _loads_json(text: str) -> Any:
+    """解析 JSON：优先使用 orjson，失败时回退到标准库（兼容 NaN、超大整数，并给出可读的错误信息）"""
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        return json.loads(text)
+
+
+class TokenBucket:
+    """请求数 / token 数双令牌桶限流器，在本地排队而不是触发服务端限流后再退避重试"""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        """
+        初始化令牌桶
+
+        Args:
+            requests_per_minute: 每分钟请求数上限（RPM）
+            tokens_per_minute: 每分钟 token 数上限（TPM）
+        """
+        self.request_capacity = float(requests_per_minute)
+        self.token_capacity = float(tokens_per_minute)
+        self.request_tokens = self.request_capacity
+        self.token_tokens = self.token_capacity
+        self.last_update = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, estimated_tokens: int = 0) -> None:
+        """
+        获取一次请求配额，配额不足时阻塞等待
+
+        Args:
+            estimated_tokens: 本次请求预估消耗的 token 数
+        """
+        # 超过桶容量的请求只需等到桶满即可发出
+        needed_tokens = min(float(estimated_tokens), self.token_capacity)
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed = now - self.last_update
+                self.last_update = now
+                self.request_tokens = min(self.request_capacity,
+                                          self.request_tokens + elapsed * self.request_capacity / 60)
+                self.token_tokens = min(self.token_capacity,
+                                        self.token_tokens + elapsed * self.token_capacity / 60)
+
+                if self.request_tokens >= 1 and self.token_tokens >= needed_tokens:
+                    self.request_tokens -= 1
+                    self.token_tokens -= needed_tokens
+                    return
+
+                wait = max(
+                    (1 - self.request_tokens) * 60 / self.request_capacity,
+                    (needed_tokens - self.token_tokens) * 60 / self.token_capacity
+                )
+
+            time.sleep(wait)
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def _get_response_cache() -> ResponseCache:
+    """获取进程内共享的响应缓存（首次使用时创建）"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(os.getenv("ARK_CACHE_PATH", _DEFAULT_CACHE_PATH))
+        return _response_cache
+
+
+def _get_rate_limiter() -> Optional[TokenBucket]:
+    """获取进程内共享的限流器（配额按账号计算，所有客户端实例共用），未配置 RPM/TPM 或配置为 0 时不限流"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            rpm = int(os.getenv("ARK_RPM", "0"))
+            tpm = int(os.getenv("ARK_TPM", "0"))
+            _rate_limiter = TokenBucket(rpm, tpm) if rpm > 0 and tpm > 0 else False
+        return _rate_limiter or None
+
 
 class DoubaoAPIClient:
     """豆包 API 客户端"""
@@ -70,13 +227,32 @@ class DoubaoAPIClient:
         else:
             self.reasoning_effort = reasoning_effort or None  # 默认不设置
 
+        # 同一客户端上同时进行的 HTTP 请求数上限（维度并发 × 剧本并发时防止请求过载）
+        self._request_slots = threading.BoundedSemaphore(int(os.getenv("ARK_MAX_CONCURRENCY", "16")))
+
+        # 读取响应缓存模式
+        cache_mode_env = os.getenv("ARK_CACHE", "disabled").lower()
+        self.cache_mode = cache_mode_env if cache_mode_env in _CACHE_MODES else "disabled"
+
         if not self.api_key:
             raise ValueError("API 密钥未设置，请在 .env 文件中配置 ARK_API_KEY")
 
+        # 复用 HTTP 连接（keep-alive），避免每次请求重新进行 TCP/TLS 握手
+        # 重试由 _make_request 自行处理，这里不让 urllib3 重试
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=0)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        })
+
     def _make_request(
         self,
         messages: List[Dict[str, str]],
-        response_format: Optional[Dict[str, str]] = None
+        response_format: Optional[Dict[str, str]] = None,
+        refresh_cache: bool = False
     ) -> Dict[str, Any]:
         """
         发起 API 请求
@@ -84,18 +260,11 @@ class DoubaoAPIClient:
         Args:
             messages: 消息列表
             response_format: 响应格式（如 {"type": "json_object"}）
+            refresh_cache: 跳过缓存查询并用新响应覆盖缓存（用于解析失败后的重试，回放模式下无效）
 
         Returns:
             API 响应数据
         """
-        import logging
-        logger = logging.getLogger(__name__)
-
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-
         # 计算输入 token 大小（粗略估计）
         total_chars = sum(len(msg.get('content', '')) for msg in messages)
         logger.info(f"发起 API 请求，输入字符数: {total_chars}, 超时设置: {self.timeout}秒")
@@ -121,18 +290,45 @@ class DoubaoAPIClient:
         if response_format:
             payload["response_format"] = response_format
 
+        # 查询响应缓存（payload 已包含模型、消息、温度、max_tokens、思考参数和响应格式）
+        cache = None
+        cache_key = None
+        if self.cache_mode != "disabled":
+            cache = _get_response_cache()
+            cache_key = cache.make_key(payload)
+            # 回放模式不能发起请求，只能读取缓存
+            cached = None if refresh_cache and self.cache_mode != "replay" else cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"命中 API 响应缓存: {cache_key[:12]}")
+                return cached
+            if self.cache_mode == "replay":
+                raise RuntimeError(f"回放模式下未找到缓存的 API 响应: {cache_key}")
+
+        rate_limiter = _get_rate_limiter()
+        if rate_limiter is not None:
+            # 中文剧本按字符数/3 估算会严重低估 token 数，按文字类型分别估算；输出 token 也计入配额
+            estimated_tokens = sum(estimate_tokens(msg.get('content', '')) for msg in messages) + self.max_tokens
+
+        # 只序列化一次请求体（Content-Type 已在 session 头中设置）
+        body = orjson.dumps(payload)
+
         for attempt in range(self.max_retries):
             try:
-                logger.info(f"API 请求尝试 {attempt + 1}/{self.max_retries}")
-                response = requests.post(
-                    self.api_url,
-                    headers=headers,
-                    json=payload,
-                    timeout=self.timeout
-                )
+                logger.debug(f"API 请求尝试 {attempt + 1}/{self.max_retries}")
+                if rate_limiter is not None:
+                    rate_limiter.acquire(estimated_tokens)
+                with self._request_slots:
+                    response = self._session.post(
+                        self.api_url,
+                        data=body,
+                        timeout=self.timeout
+                    )
                 response.raise_for_status()
-                logger.info(f"API 请求成功，状态码: {response.status_code}")
-                return response.json()
+                logger.debug(f"API 请求成功，状态码: {response.status_code}")
+                response_data = response.json()
+                if cache is not None:
+                    cache.set(cache_key, response_data)
+                return response_data
 
             except requests.exceptions.Timeout:
                 logger.warning(f"API 请求超时（第 {attempt + 1} 次尝试）")
@@ -143,7 +339,7 @@ class DoubaoAPIClient:
             except requests.exceptions.HTTPError as e:
                 logger.warning(f"API HTTP 错误: {e}")
                 if attempt == self.max_retries - 1:
-                    error_detail = response.text if 'response' in locals() else str(e)
+                    error_detail = e.response.text if getattr(e, "response", None) is not None else str(e)
                     raise RuntimeError(f"API 请求失败: {error_detail}")
                 time.sleep(2 ** attempt)
 
@@ -157,7 +353,9 @@ class DoubaoAPIClient:
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
-        json_mode: bool = False
+        json_mode: bool = False,
+        context: Optional[List[str]] = None,
+        refresh_cache: bool = False
     ) -> str:
         """
         发送聊天请求
@@ -166,13 +364,12 @@ class DoubaoAPIClient:
             prompt: 用户提示词
             system_prompt: 系统提示词
             json_mode: 是否启用 JSON 模式
+            context: 放在提示词之前的用户消息（如剧本全文），多次请求共用相同前缀时便于服务端复用前缀缓存
+            refresh_cache: 跳过响应缓存查询并覆盖缓存（见 _make_request）
 
         Returns:
             模型响应文本
         """
-        import logging
-        logger = logging.getLogger(__name__)
-
         logger.info(f"📤 准备发送 API 请求 (JSON模式: {json_mode})")
         logger.info(f"📝 Prompt 长度: {len(prompt)} 字符")
 
@@ -181,12 +378,15 @@ class DoubaoAPIClient:
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
 
+        for content in context or ():
+            messages.append({"role": "user", "content": content})
+
         messages.append({"role": "user", "content": prompt})
 
         response_format = {"type": "json_object"} if json_mode else None
 
         logger.info("⏳ 等待豆包 API 响应...")
-        response_data = self._make_request(messages, response_format)
+        response_data = self._make_request(messages, response_format, refresh_cache=refresh_cache)
         logger.info("✅ 收到 API 响应")
 
         try:
@@ -201,7 +401,8 @@ class DoubaoAPIClient:
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
-        max_parse_retries: int = 2
+        max_parse_retries: int = 2,
+        context: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """
         发送聊天请求并解析 JSON 响应
@@ -210,13 +411,11 @@ class DoubaoAPIClient:
             prompt: 用户提示词
             system_prompt: 系统提示词
             max_parse_retries: 解析失败时的最大重试次数
+            context: 放在提示词之前的用户消息（见 chat）
 
         Returns:
             解析后的 JSON 数据
         """
-        import logging
-        logger = logging.getLogger(__name__)
-
         # 添加更强的 JSON 格式要求到系统提示词
         enhanced_system_prompt = """你必须严格按照 JSON 格式返回结果，不要添加任何其他文本或解释。
 返回的内容必须是一个完整的 JSON 对象，以 { 开始，以 } 结束。
@@ -227,7 +426,11 @@ class DoubaoAPIClient:
 
         for retry in range(max_parse_retries):
             try:
-                response_text = self.chat(prompt, enhanced_system_prompt, json_mode=True)
+                # 重试时请求内容与首次完全相同，必须绕过缓存，否则只会取回同一个无法使用的响应
+                response_text = self.chat(
+                    prompt, enhanced_system_prompt, json_mode=True, context=context,
+                    refresh_cache=retry > 0
+                )
 
                 # 记录响应用于调试
                 logger.debug(f"API 响应内容 (前500字符): {response_text[:500]}")
@@ -244,7 +447,7 @@ class DoubaoAPIClient:
 
                 # 尝试解析 JSON
                 try:
-                    parsed = json.loads(cleaned_response)
+                    parsed = _loads_json(cleaned_response)
                 except json.JSONDecodeError as e:
                     # 如果 JSON 解析失败，检查是否是单个值（如数字）
                     cleaned_response_stripped = cleaned_response.strip()
@@ -253,6 +456,9 @@ class DoubaoAPIClient:
                     # 先尝试直接转换为数字
                     try:
                         num_value = float(cleaned_response_stripped)
+                        # float() 也接受 nan/inf，这类值不能作为分数
+                        if not math.isfinite(num_value):
+                            raise ValueError(cleaned_response_stripped)
                         # 如果转换成功，说明是单个数字
                         logger.warning(f"⚠️ API 返回了单个数值而非 JSON 对象: {cleaned_response_stripped}")
                         if retry < max_parse_retries - 1:
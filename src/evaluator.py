@@ -4,19 +4,135 @@
 """
 
 import os
+import re
+import copy
+import math
+import bisect
+import codecs
+import hashlib
+import logging
 import yaml
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 from tqdm import tqdm
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 
-from .api_client import DoubaoAPIClient
+from .api_client import DoubaoAPIClient, ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# 剧本结构分析结果缓存（按预处理后内容的哈希，LRU 淘汰）
+_STRUCTURE_CACHE_SIZE = 64
+_structure_cache = OrderedDict()
+_structure_cache_lock = threading.Lock()
+
+# 提示词模板中剧本占位符的替换文本：剧本全文作为单独的消息放在评测要求之前，
+# 各维度请求共享同一前缀，服务端可复用前缀缓存
+_SCRIPT_CONTENT_REFERENCE = "（剧本全文见上一条消息）"
+
+# 剧本预处理使用的正则
+_CHINESE_CHAR_RE = re.compile(r'[\u4e00-\u9fff]')
+_ENGLISH_CHAR_RE = re.compile(r'[a-zA-Z]')
+# 激进清理：只保留中文、英文、数字和常用标点
+_AGGRESSIVE_CLEAN_RE = re.compile(r'[^\u4e00-\u9fffa-zA-Z0-9\s\.,!?;:：，。！？；、()\[\]""''《》·—\-–—/]')
+_WHITESPACE_RE = re.compile(r'\s+')
+_SENTENCE_END_RE = re.compile(r'[。！？](?=[^\\s])')
+_BLANK_LINES_RE = re.compile(r'\n\s*\n\s*\n+')
+
+# 预处理时的单字符替换：移除 BOM、\r 统一为 \n、全角空格替换为半角空格
+_NORMALIZE_TABLE = str.maketrans({'\ufeff': None, '\r': '\n', '\u3000': ' '})
+
+# 剧本结构识别的关键词（每组合并为一个正则，一次扫描即可判断是否包含任一关键词）
+_STYLE_KEYWORDS_RE = re.compile(r'剧本风格|风格|类型|改编')
+_SUMMARY_KEYWORDS_RE = re.compile(r'故事概要|剧情简介|内容简介|梗概')
+_CHARACTER_KEYWORDS_RE = re.compile(r'人物设定|角色介绍|主要人物|人物小传')
+_CHARACTER_SECTION_END_RE = re.compile(r'剧情|分集|opening|development')
+_PLOT_KEYWORDS_RE = re.compile(r'剧情大纲|故事线|结构|opening|development|climax|ending')
+# 结构说明头部中列出的剧本组成部分
+_STRUCTURE_SECTION_LABELS = (
+    ('has_style', '剧本风格设定'),
+    ('has_summary', '故事概要'),
+    ('has_characters', '人物设定'),
+    ('has_plot_outline', '剧情大纲'),
+    ('has_episodes', '分集剧本'),
+)
+# 人物条目的项目符号
+_BULLET_PREFIXES = ('-', '•', '●', '○')
+
+# 分集剧本的行特征（去掉行首空白后从行首匹配），多行模式下一次扫描全文即可统计命中行数：
+# 单独的数字（集数）、【时长】/【场景】标记、分集剧本标题、第X集
+_EPISODE_LINE_RE = re.compile(r'^[^\S\n]*(?:\d+[^\S\n]*$|【时长】|【场景】|分集剧本|第\d+集)', re.MULTILINE)
+
+# 等级分数线（升序）及对应等级：<60 D, 60-69 C, 70-79 B, 80-89 A, >=90 S
+_GRADE_BREAKS = (60, 70, 80, 90)
+_GRADES = "DCBAS"
+
+# 剧本文件尝试的编码（按顺序）
+SCRIPT_ENCODINGS = ['utf-8', 'gbk', 'gb2312', 'latin-1']
+# 可根据 BOM 直接识别的编码（解码时会去掉 BOM）
+_BOM_ENCODINGS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# 发送给模型的剧本最大字符数
+MAX_SCRIPT_LENGTH = 50000
+# 从文件读取时保留的字符数（为预处理删除空行等留出余量，超出部分最终也会被截断）
+_SCRIPT_READ_LIMIT = MAX_SCRIPT_LENGTH * 2
+# 剧本被截断时附加的提示
+_TRUNCATION_NOTICE = "\n\n[内容过长，已截断...]"
+# 单个字符最多占用的字节数（UTF-8）
+_MAX_BYTES_PER_CHAR = 4
+
+
+@lru_cache(maxsize=16)
+def _load_yaml_file(path: str, mtime: float, size: int) -> Dict[str, Any]:
+    """解析 YAML 配置文件（按路径、修改时间和大小缓存，返回值为共享对象，调用方不应修改）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
+@lru_cache(maxsize=100)
+def _read_prompt_file(prompt_path: str, mtime: float, size: int) -> str:
+    """
+    读取提示词文件并将剧本占位符替换为引用文本
+
+    按路径、修改时间和大小缓存，每个模板只需读取、替换一次，文件被修改后自动重新读取
+    """
+    with open(prompt_path, 'r', encoding='utf-8') as f:
+        return f.read().replace('{script_content}', _SCRIPT_CONTENT_REFERENCE)
+
+
+def _line_offset(text: str, line_count: int) -> int:
+    """返回 text 前 line_count 行（不含第 line_count 个换行符）结束处的下标，不足 line_count 行时返回文本长度"""
+    pos = -1
+    for _ in range(line_count):
+        pos = text.find('\n', pos + 1)
+        if pos == -1:
+            return len(text)
+    return pos
+
+
+def _iter_lines(text: str, start: int = 0):
+    """从下标 start 开始逐行生成 text 中的行（按需切分，不一次性生成整个行列表）"""
+    while start <= len(text):
+        end = text.find('\n', start)
+        if end == -1:
+            end = len(text)
+        yield text[start:end]
+        start = end + 1
 
 
 class ScriptEvaluator:
     """剧本评测器"""
 
+    # 项目根目录（config.yml、prompts/ 所在目录）
+    _PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
     def __init__(self, config_path: Optional[str] = None):
         """
         初始化评测器
@@ -26,10 +142,11 @@ class ScriptEvaluator:
         """
         # 加载配置
         if config_path is None:
-            config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config.yml")
+            config_path = os.fspath(self._PROJECT_ROOT / "config.yml")
 
-        with open(config_path, 'r', encoding='utf-8') as f:
-            self.config = yaml.safe_load(f)
+        # 配置解析结果在进程内缓存，深拷贝后再使用，避免实例间相互影响
+        st = os.stat(config_path)
+        self.config = copy.deepcopy(_load_yaml_file(config_path, st.st_mtime, st.st_size))
 
         # 初始化 API 客户端
         self.api_client = DoubaoAPIClient()
@@ -37,12 +154,28 @@ class ScriptEvaluator:
         # 获取评测维度配置
         self.dimensions = self.config.get('evaluation_dimensions', {})
 
+        # 预先整理各维度的权重和名称，避免每次计算都逐层查找配置
+        self._weights = {key: cfg.get('weight', 0) for key, cfg in self.dimensions.items()}
+        self._dimension_names = {key: cfg.get('name', key) for key, cfg in self.dimensions.items()}
+
         # 获取提示词模板目录
-        self.prompts_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "prompts")
+        self.prompts_dir = self._PROJECT_ROOT / "prompts"
+
+        # 维度评测共享的线程池（同一评测器上的所有评测共用，避免每次评测重复创建线程）
+        # 并发数优先取环境变量 EVAL_DIMENSION_WORKERS，其次 config.yml 中的 api_concurrency
+        api_concurrency = int(os.getenv("EVAL_DIMENSION_WORKERS", self.config.get('api_concurrency', 8)))
+        self._executor = ThreadPoolExecutor(max_workers=max(1, api_concurrency),
+                                            thread_name_prefix="dimension-eval")
+
+        # 维度评测结果的磁盘缓存（config.yml 中 cache_results 为 true 时启用）
+        self._result_cache = None
+        if self.config.get('cache_results', False):
+            cache_path = os.fspath(self._PROJECT_ROOT / ".eval_cache" / "results.sqlite3")
+            self._result_cache = ResponseCache(cache_path)
 
     def _load_prompt(self, dimension: str) -> str:
         """
-        加载指定维度的提示词模板
+        加载指定维度的提示词模板（剧本占位符已替换为引用，剧本全文单独发送）
 
         Args:
             dimension: 维度名称
@@ -54,12 +187,12 @@ class ScriptEvaluator:
         if not prompt_file:
             raise ValueError(f"维度 {dimension} 没有配置提示词文件")
 
-        prompt_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), prompt_file)
+        prompt_path = os.fspath(self._PROJECT_ROOT / prompt_file)
 
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        st = os.stat(prompt_path)
+        return _read_prompt_file(prompt_path, st.st_mtime, st.st_size)
 
-    def _prepare_script_content(self, script_path: str, max_length: int = 50000) -> str:
+    def _prepare_script_content(self, script_path: str, max_length: int = MAX_SCRIPT_LENGTH) -> str:
         """
         读取并准备剧本内容
 
@@ -70,29 +203,88 @@ class ScriptEvaluator:
         Returns:
             剧本内容
         """
-        # 尝试多种编码读取文件
-        encodings = ['utf-8', 'gbk', 'gb2312', 'latin-1']
-        content = None
+        return self._prepare_text_content(self._read_script_prefix(script_path, max_length * 2), max_length)
+
+    def _read_script_prefix(self, script_path: str, limit: int) -> str:
+        """
+        读取剧本文件开头最多 limit 个字符，文件更长时在末尾附加截断提示
+
+        预处理后若仍超过最大长度，提示会随超出部分一起被截掉并重新附加；
+        若预处理（如合并空行）使文本变短，提示仍然保留
+
+        Args:
+            script_path: 剧本文件路径
+            limit: 最多读取的字符数
+
+        Returns:
+            剧本文本
+        """
+        content = self._read_script_file(script_path, limit + 1)
+        if len(content) > limit:
+            content = content[:limit] + _TRUNCATION_NOTICE
+        return content
+
+    def _read_script_file(self, script_path: str, max_chars: Optional[int] = None) -> str:
+        """
+        读取剧本文件文本
+
+        Args:
+            script_path: 剧本文件路径
+            max_chars: 最多返回的字符数，None 表示读取整个文件；超大文件只读取开头部分
 
+        Returns:
+            原始文本内容
+        """
+        # 只读取一次文件（限定字符数时只读取所需的字节），在内存中依次尝试多种编码
+        with open(script_path, 'rb') as f:
+            if max_chars is None:
+                data = f.read()
+                truncated = False
+            else:
+                byte_limit = max_chars * _MAX_BYTES_PER_CHAR
+                data = f.read(byte_limit + 1)
+                truncated = len(data) > byte_limit
+                data = data[:byte_limit]
+
+        # 带 BOM 的文件直接按 BOM 确定编码（UTF-16 文件按原有编码列表只能被 latin-1 解成乱码）
+        encodings = SCRIPT_ENCODINGS
+        for bom, bom_encoding in _BOM_ENCODINGS:
+            if data.startswith(bom):
+                encodings = [bom_encoding] + SCRIPT_ENCODINGS[1:]
+                break
+
+        content = None
         for encoding in encodings:
             try:
-                with open(script_path, 'r', encoding=encoding) as f:
-                    content = f.read()
+                # 截断处可能切开多字节字符，使用增量解码器丢弃末尾不完整的字节
+                content = codecs.getincrementaldecoder(encoding)().decode(data, final=not truncated)
                 break
             except UnicodeDecodeError:
                 continue
 
         # 如果所有编码都失败，使用 errors='ignore'
         if content is None:
-            with open(script_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
+            content = data.decode('utf-8', errors='ignore')
 
+        return content if max_chars is None else content[:max_chars]
+
+    def _prepare_text_content(self, content: str, max_length: int = MAX_SCRIPT_LENGTH) -> str:
+        """
+        预处理并截断剧本文本
+
+        Args:
+            content: 原始剧本文本
+            max_length: 最大字符数
+
+        Returns:
+            剧本内容
+        """
         # 预处理剧本内容
         content = self._preprocess_script(content)
 
         # 截断过长的剧本
         if len(content) > max_length:
-            content = content[:max_length] + "\n\n[内容过长，已截断...]"
+            content = content[:max_length] + _TRUNCATION_NOTICE
 
         return content
 
@@ -106,14 +298,10 @@ class ScriptEvaluator:
         Returns:
             处理后的剧本内容
         """
-        import re
-        import logging
-        logger = logging.getLogger(__name__)
-
         # 0. 验证和修复文本质量（特别是DOCX提取的文本）
         total_chars = len(content)
-        chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', content))
-        english_chars = len(re.findall(r'[a-zA-Z]', content))
+        chinese_chars = len(_CHINESE_CHAR_RE.findall(content))
+        english_chars = len(_ENGLISH_CHAR_RE.findall(content))
         valid_chars = chinese_chars + english_chars
 
         # 如果有效字符比例过低，可能是乱码
@@ -124,58 +312,66 @@ class ScriptEvaluator:
                 logger.warning(f"   总字符: {total_chars}, 中文: {chinese_chars}, 英文: {english_chars}")
                 # 尝试更激进的清理
                 # 只保留中文、英文、数字和常用标点
-                content = re.sub(r'[^\u4e00-\u9fffa-zA-Z0-9\s\.,!?;:：，。！？；、()\[\]""''《》·—\-–—/]', '', content)
+                content = _AGGRESSIVE_CLEAN_RE.sub('', content)
                 # 移除多余空白
-                content = re.sub(r'\s+', ' ', content)
+                content = _WHITESPACE_RE.sub(' ', content)
                 # 恢复段落结构
-                content = re.sub(r'[。！？](?=[^\\s])', r'\g<0>\n\n', content)
+                content = _SENTENCE_END_RE.sub(r'\g<0>\n\n', content)
                 logger.info("✓ 已应用激进清理模式，移除了可疑字符")
 
-        # 1. 移除 BOM 标记
-        content = content.replace('\ufeff', '')
-
-        # 2. 统一换行符
-        content = content.replace('\r\n', '\n').replace('\r', '\n')
-
-        # 3. 移除全角空格
-        content = content.replace('\u3000', ' ')
+        # 1-3. 移除 BOM 标记、统一换行符、全角空格替换为半角（\r\n 先合并，其余单字符替换一次完成）
+        content = content.replace('\r\n', '\n').translate(_NORMALIZE_TABLE)
 
         # 4. 移除连续的空行（保留最多一个空行）
-        content = re.sub(r'\n\s*\n\s*\n+', '\n\n', content)
+        content = _BLANK_LINES_RE.sub('\n\n', content)
 
         # 5. 智能识别剧本格式并添加结构化标记
-        script_info = self._analyze_script_structure(content)
+        script_info = self._get_script_structure(content)
 
-        # 如果识别为短剧剧本，添加格式说明
-        if script_info['is_short_drama']:
-            # 在开头添加结构说明，帮助 AI 更好理解
-            header = f"""# 短剧剧本结构分析
+        # 如果识别为短剧剧本，添加格式说明（只在内容足够长时添加头部，避免影响短剧本）
+        if script_info['is_short_drama'] and len(content) > 2000:
+            # 在开头添加结构说明，帮助 AI 更好理解；各部分收集到列表后一次拼接
+            parts = [f"""# 短剧剧本结构分析
 
 标题：{script_info.get('title', '未知')}
 总集数：{script_info.get('total_episodes', '未知')}
 人物数量：{script_info.get('character_count', '未知')}
 
 包含部分：
-"""
-            if script_info.get('has_style'):
-                header += "- 剧本风格设定\n"
-            if script_info.get('has_summary'):
-                header += "- 故事概要\n"
-            if script_info.get('has_characters'):
-                header += "- 人物设定\n"
-            if script_info.get('has_plot_outline'):
-                header += "- 剧情大纲\n"
-            if script_info.get('has_episodes'):
-                header += "- 分集剧本\n"
-
-            header += f"\n--- 剧本内容 ---\n\n"
-
-            # 只在内容足够长时添加头部（避免影响短剧本）
-            if len(content) > 2000:
-                content = header + content
+"""]
+            for flag, label in _STRUCTURE_SECTION_LABELS:
+                if script_info.get(flag):
+                    parts.append(f"- {label}\n")
+            parts.append("\n--- 剧本内容 ---\n\n")
+            parts.append(content)
+            content = ''.join(parts)
 
         return content.strip()
 
+    def _get_script_structure(self, content: str) -> dict:
+        """
+        获取剧本结构分析结果（相同内容重复评测时复用缓存）
+
+        Args:
+            content: 剧本内容
+
+        Returns:
+            结构分析结果字典（共享对象，调用方不应修改）
+        """
+        key = hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        with _structure_cache_lock:
+            if key in _structure_cache:
+                _structure_cache.move_to_end(key)
+                return _structure_cache[key]
+
+        script_info = self._analyze_script_structure(content)
+
+        with _structure_cache_lock:
+            _structure_cache[key] = script_info
+            while len(_structure_cache) > _STRUCTURE_CACHE_SIZE:
+                _structure_cache.popitem(last=False)
+        return script_info
+
     def _analyze_script_structure(self, content: str) -> dict:
         """
         分析剧本结构，识别是否为短剧剧本
@@ -184,10 +380,8 @@ class ScriptEvaluator:
             content: 剧本内容
 
         Returns:
-            结构分析结果字典
+            结构分析结果字典（确定不是短剧剧本时不统计人物数量和集数）
         """
-        import re
-
         result = {
             'is_short_drama': False,
             'title': None,
@@ -200,62 +394,50 @@ class ScriptEvaluator:
             'has_episodes': False
         }
 
-        lines = content.split('\n')
-
         # 1. 检测标题（第一行通常是标题）
-        if len(lines) > 0:
-            first_line = lines[0].strip()
-            if len(first_line) < 50 and not any(char in first_line for char in ['【', '】', ':', '：']):
-                result['title'] = first_line
+        first_line = content[:_line_offset(content, 1)].strip()
+        if len(first_line) < 50 and not any(char in first_line for char in ['【', '】', ':', '：']):
+            result['title'] = first_line
 
+        # 2-4 只检测开头若干行：关键词不含换行，直接在原文前 N 行的范围内搜索，无需切片复制行列表
         # 2. 检测剧本风格
-        style_patterns = ['剧本风格', '风格', '类型', '改编']
-        result['has_style'] = any(any(pattern in line for pattern in style_patterns) for line in lines[:20])
+        result['has_style'] = _STYLE_KEYWORDS_RE.search(content, 0, _line_offset(content, 20)) is not None
 
         # 3. 检测故事概要
-        summary_patterns = ['故事概要', '剧情简介', '内容简介', '梗概']
-        result['has_summary'] = any(any(pattern in line for pattern in summary_patterns) for line in lines[:30])
+        result['has_summary'] = _SUMMARY_KEYWORDS_RE.search(content, 0, _line_offset(content, 30)) is not None
 
         # 4. 检测人物设定
-        character_patterns = ['人物设定', '角色介绍', '主要人物', '人物小传']
-        result['has_characters'] = any(any(pattern in line for pattern in character_patterns) for line in lines[:50])
+        result['has_characters'] = _CHARACTER_KEYWORDS_RE.search(content, 0, _line_offset(content, 50)) is not None
+
+        # 5. 检测剧情大纲（关键词不含换行，整体转小写后扫描一次即可）
+        result['has_plot_outline'] = _PLOT_KEYWORDS_RE.search(content.lower()) is not None
+
+        # 前四个特征加上分集特征也不足 3 个时不可能是短剧剧本，无需再统计人物和集数
+        # （这两个数量只用于短剧剧本的结构说明）
+        header_features = (result['has_style'] + result['has_summary']
+                           + result['has_characters'] + result['has_plot_outline'])
+        if header_features + 1 < 3:
+            return result
 
         # 统计人物数量
         if result['has_characters']:
-            # 查找人物设定块
-            in_character_section = False
-            for line in lines:
-                if any(pattern in line for pattern in character_patterns):
-                    in_character_section = True
+            # 人物设定块从第一个包含人物设定关键词的行之后开始，按需逐行读取直到块结束
+            keyword_line_end = content.find('\n', _CHARACTER_KEYWORDS_RE.search(content).start())
+            section_lines = _iter_lines(content, keyword_line_end + 1) if keyword_line_end != -1 else ()
+            for line in section_lines:
+                # 块内再次出现的设定标题行直接跳过
+                if _CHARACTER_KEYWORDS_RE.search(line):
                     continue
-                if in_character_section:
-                    # 检测人物条目（通常是 - 开头或者名字 - 描述格式）
-                    if line.strip() and not line.startswith(' '):
-                        if line[0] in '-•●○':
-                            result['character_count'] += 1
-                        elif ' - ' in line or '——' in line:
-                            result['character_count'] += 1
-                    # 跳出人物设定块
-                    if any(keyword in line for keyword in ['剧情', '分集', 'opening', 'development']):
-                        break
-
-        # 5. 检测剧情大纲
-        plot_patterns = ['剧情大纲', '故事线', '结构', 'opening', 'development', 'climax', 'ending']
-        result['has_plot_outline'] = any(any(pattern in line.lower() for pattern in plot_patterns) for line in lines)
+                # 检测人物条目（通常是 - 开头或者名字 - 描述格式）
+                if line and not line.isspace() and not line.startswith(' '):
+                    if line.startswith(_BULLET_PREFIXES) or ' - ' in line or '——' in line:
+                        result['character_count'] += 1
+                # 跳出人物设定块
+                if _CHARACTER_SECTION_END_RE.search(line):
+                    break
 
         # 6. 检测分集剧本
-        episode_patterns = [
-            r'^\d+\s*$',  # 单独的数字（集数）
-            r'【时长】',  # 时长标记
-            r'【场景】',  # 场景标记
-            r'分集剧本',  # 分集剧本标题
-            r'^第\d+集'  # 第X集
-        ]
-
-        episode_count = 0
-        for line in lines:
-            if any(re.match(pattern, line.strip()) for pattern in episode_patterns):
-                episode_count += 1
+        episode_count = sum(1 for _ in _EPISODE_LINE_RE.finditer(content))
 
         result['has_episodes'] = episode_count > 3
         result['total_episodes'] = episode_count
@@ -288,18 +470,30 @@ class ScriptEvaluator:
         Returns:
             评测结果
         """
-        import logging
-        logger = logging.getLogger(__name__)
-
         # 加载提示词模板
         logger.debug(f"加载维度 {dimension} 的提示词模板...")
-        prompt_template = self._load_prompt(dimension)
+        # 剧本内容单独作为前置消息发送，模板中只保留引用
+        prompt = self._load_prompt(dimension)
 
-        # 替换剧本内容
-        prompt = prompt_template.replace('{script_content}', script_content)
+        dimension_name = self.dimensions[dimension].get('name', dimension)
+
+        # 剧本内容或提示词模板变化时缓存 key 随之变化，旧结果自动失效
+        cache_key = None
+        if self._result_cache is not None:
+            cache_key = self._result_cache.make_key({
+                'script': hashlib.blake2b(script_content.encode('utf-8')).hexdigest(),
+                'dimension': dimension,
+                'prompt': hashlib.blake2b(prompt.encode('utf-8')).hexdigest(),
+                'model': self.api_client.model_endpoint,
+            })
+            cached = self._result_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"命中维度 {dimension_name} 的评测结果缓存: {cache_key[:12]}")
+                print(f"✅ [{dimension}] 使用缓存结果: {cached.get('total_score', 0)}/{cached.get('max_score', 100)} 分")
+                cached['cached'] = True
+                return cached
 
         # 调用 API
-        dimension_name = self.dimensions[dimension].get('name', dimension)
         logger.info("=" * 50)
         logger.info(f"📊 开始评测维度: {dimension_name} ({dimension})")
         logger.info("=" * 50)
@@ -307,7 +501,7 @@ class ScriptEvaluator:
 
         try:
             logger.info("⏳ 调用豆包 API 进行评测...")
-            result = self.api_client.chat_with_json_response(prompt)
+            result = self.api_client.chat_with_json_response(prompt, context=[script_content])
 
             # 验证返回结果是否为字典
             if not isinstance(result, dict):
@@ -354,24 +548,18 @@ class ScriptEvaluator:
                 logger.info(f"✅ 维度 {dimension_name} 评测成功")
                 logger.info(f"📈 得分: {score}/{max_score}")
                 print(f"✅ [{dimension}] 评测完成: {score}/{max_score} 分")
+                # 只缓存正常返回的结果，API 异常的结果下次重新评测
+                if cache_key is not None:
+                    self._result_cache.set(cache_key, result)
 
             logger.info("=" * 50)
 
             return result
         except Exception as e:
-            logger.error(f"❌ 评测维度 {dimension} 失败: {str(e)}")
+            logger.exception("❌ 评测维度 %s 失败: %s", dimension, e)
             print(f"❌ [{dimension}] 评测失败: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
-            print(traceback.format_exc())
             # 返回错误结果
-            return {
-                "dimension": dimension,
-                "dimension_name": dimension_name,
-                "error": str(e),
-                "total_score": 0,
-                "max_score": 100
-            }
+            return self._make_error_result(dimension, e)
 
     def evaluate(
         self,
@@ -390,9 +578,35 @@ class ScriptEvaluator:
         Returns:
             完整评测结果
         """
-        import logging
-        logger = logging.getLogger(__name__)
+        return self.evaluate_text(
+            self._read_script_prefix(script_path, _SCRIPT_READ_LIMIT),
+            script_name=Path(script_path).stem,
+            dimensions=dimensions,
+            show_progress=show_progress,
+            script_path=script_path
+        )
+
+    def evaluate_text(
+        self,
+        text: str,
+        script_name: str = "unnamed",
+        dimensions: Optional[List[str]] = None,
+        show_progress: bool = True,
+        script_path: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        对内存中的剧本文本进行全面评测（无需先写入文件）
 
+        Args:
+            text: 剧本文本
+            script_name: 剧本名称
+            dimensions: 要评测的维度列表，None 表示评测所有维度
+            show_progress: 是否显示进度条
+            script_path: 剧本来源路径（仅记录在结果中）
+
+        Returns:
+            完整评测结果
+        """
         # 确定要评测的维度
         if dimensions is None:
             dimensions = list(self.dimensions.keys())
@@ -400,17 +614,14 @@ class ScriptEvaluator:
         logger.info("")
         logger.info("🎬" * 30)
         logger.info(f"🎬 开始评测剧本，共 {len(dimensions)} 个维度")
-        logger.info(f"📋 评测维度: {', '.join([self.dimensions.get(d, {}).get('name', d) for d in dimensions])}")
+        logger.info(f"📋 评测维度: {', '.join([self._dimension_names.get(d, d) for d in dimensions])}")
         logger.info("🎬" * 30)
 
         # 准备剧本内容
         logger.info("📄 正在准备剧本内容...")
-        script_content = self._prepare_script_content(script_path)
+        script_content = self._prepare_text_content(text)
         logger.info(f"✅ 剧本内容准备完成，长度: {len(script_content)} 字符")
 
-        # 获取剧本信息
-        script_name = Path(script_path).stem
-
         result = {
             "script_name": script_name,
             "script_path": script_path,
@@ -426,33 +637,19 @@ class ScriptEvaluator:
         else:
             progress_bar = None
 
-        # 使用线程池并发执行
-        with ThreadPoolExecutor(max_workers=8) as executor:  # 最多8个并发（适配18个维度）
-            # 提交所有评测任务
-            future_to_dimension = {
-                executor.submit(self._evaluate_dimension, dimension, script_content): dimension
-                for dimension in dimensions
-            }
-
-            # 收集结果
-            for future in as_completed(future_to_dimension):
-                dimension = future_to_dimension[future]
-                try:
-                    dimension_result = future.result()
-                    result["dimensions"][dimension] = dimension_result
-                    logger.info(f"维度 {dimension} 评测完成，得分: {dimension_result.get('total_score', 0)}")
-                except Exception as e:
-                    logger.error(f"维度 {dimension} 评测失败: {str(e)}")
-                    result["dimensions"][dimension] = {
-                        "dimension": dimension,
-                        "dimension_name": self.dimensions.get(dimension, {}).get('name', dimension),
-                        "error": str(e),
-                        "total_score": 0,
-                        "max_score": 100
-                    }
+        # 提交到评测器共享的线程池并发执行
+        future_to_dimension = {
+            self._executor.submit(self._evaluate_dimension, dimension, script_content): dimension
+            for dimension in dimensions
+        }
 
-                if progress_bar:
-                    progress_bar.update(1)
+        # 收集结果
+        for future in as_completed(future_to_dimension):
+            dimension = future_to_dimension[future]
+            result["dimensions"][dimension] = self._get_dimension_result(future, dimension)
+
+            if progress_bar:
+                progress_bar.update(1)
 
         if progress_bar:
             progress_bar.close()
@@ -472,6 +669,44 @@ class ScriptEvaluator:
 
         return result
 
+    def _get_dimension_result(self, future, dimension: str) -> Dict[str, Any]:
+        """
+        获取维度评测任务的结果，任务异常时返回错误结果
+
+        Args:
+            future: 维度评测任务
+            dimension: 维度名称
+
+        Returns:
+            维度评测结果
+        """
+        try:
+            dimension_result = future.result()
+            logger.info(f"维度 {dimension} 评测完成，得分: {dimension_result.get('total_score', 0)}")
+            return dimension_result
+        except Exception as e:
+            logger.error(f"维度 {dimension} 评测失败: {str(e)}")
+            return self._make_error_result(dimension, e)
+
+    def _make_error_result(self, dimension: str, error: Exception) -> Dict[str, Any]:
+        """
+        构造维度评测失败时的结果
+
+        Args:
+            dimension: 维度名称
+            error: 评测过程中抛出的异常
+
+        Returns:
+            错误结果（得分为 0）
+        """
+        return {
+            "dimension": dimension,
+            "dimension_name": self._dimension_names.get(dimension, dimension),
+            "error": str(error),
+            "total_score": 0,
+            "max_score": 100
+        }
+
     def _calculate_overall_score(
         self,
         dimension_results: Dict[str, Any]
@@ -493,7 +728,7 @@ class ScriptEvaluator:
             if "error" in result:
                 continue
 
-            weight = self.dimensions.get(dimension, {}).get('weight', 0)
+            weight = self._weights.get(dimension, 0)
             score = result.get('total_score', 0)
             max_score = result.get('max_score', 100)
             dimension_name = result.get('dimension_name', dimension)
@@ -530,16 +765,10 @@ class ScriptEvaluator:
         Returns:
             等级 (S/A/B/C/D)
         """
-        if score >= 90:
-            return "S"
-        elif score >= 80:
-            return "A"
-        elif score >= 70:
-            return "B"
-        elif score >= 60:
-            return "C"
-        else:
+        # NaN 与任何分数线比较都不成立，按原逻辑归为 D
+        if math.isnan(score):
             return "D"
+        return _GRADES[bisect.bisect_right(_GRADE_BREAKS, score)]
 
     def evaluate_batch(
         self,
@@ -556,10 +785,38 @@ class ScriptEvaluator:
         Returns:
             评测结果列表
         """
-        results = []
+        if dimensions is None:
+            dimensions = list(self.dimensions.keys())
 
-        for script_path in tqdm(script_paths, desc="批量评测"):
-            result = self.evaluate(script_path, dimensions, show_progress=False)
-            results.append(result)
+        # 所有剧本的所有维度提交到同一个共享线程池，读取下一个剧本时前面剧本的维度已在评测中
+        results = []
+        future_to_key = {}
+        for index, script_path in enumerate(script_paths):
+            script_content = self._prepare_text_content(self._read_script_prefix(script_path, _SCRIPT_READ_LIMIT))
+            results.append({
+                "script_name": Path(script_path).stem,
+                "script_path": script_path,
+                "dimensions": {}
+            })
+            for dimension in dimensions:
+                future = self._executor.submit(self._evaluate_dimension, dimension, script_content)
+                future_to_key[future] = (index, dimension)
+
+        # 结果按完成顺序归并，某个剧本的最后一个维度完成后立即计算其综合评分
+        remaining = [len(dimensions)] * len(script_paths)
+        with tqdm(total=len(script_paths), desc="批量评测") as progress_bar:
+            if not dimensions:
+                for result in results:
+                    result["overall"] = self._calculate_overall_score(result["dimensions"])
+                progress_bar.update(len(results))
+
+            for future in as_completed(future_to_key):
+                index, dimension = future_to_key[future]
+                results[index]["dimensions"][dimension] = self._get_dimension_result(future, dimension)
+
+                remaining[index] -= 1
+                if remaining[index] == 0:
+                    results[index]["overall"] = self._calculate_overall_score(results[index]["dimensions"])
+                    progress_bar.update(1)
 
         return results
@@ -3,14 +3,78 @@
 """
 
 import os
+import re
 import json
+import time
+import heapq
+import orjson
+import shutil
 import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# 列表/统计查询结果的缓存时间（秒），仪表盘轮询时避免反复读取和聚合历史文件
+_QUERY_CACHE_TTL = 5
+# 查询缓存最多保存的条目数（不同筛选/搜索/游标组合各占一条），超出时淘汰最久未使用的
+_QUERY_CACHE_SIZE = 128
+
+# 完整评测结果文件只供程序读取，写成紧凑格式（不缩进）
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+# 导入文件名中的时间戳（如 20240101_120000）
+_FILENAME_TIMESTAMP_RE = re.compile(r'(\d{8}_\d{6})')
+
+# 导入时并行读取和解析文件的线程数
+_IMPORT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# 导入时先读取文件开头这么多字节判断是否可能是评测结果
+_IMPORT_SNIFF_BYTES = 4096
+
+# 逐行读取索引文件时的缓冲区大小
+_INDEX_READ_BUFFER_SIZE = 1 << 20
+
+# 索引文件中的删除标记超过该数量时重写（压缩）索引文件
+_TOMBSTONE_COMPACT_THRESHOLD = 100
+
+
+def _read_json(path: str) -> Any:
+    """读取 JSON 文件"""
+    with open(path, 'rb') as f:
+        return _parse_json(f.read())
+
+
+def _parse_json(data: bytes) -> Any:
+    """解析 JSON：优先使用 orjson，失败时回退到标准库（兼容 NaN、超大整数等）"""
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return json.loads(data)
+
+
+def _write_json(path: str, obj: Any) -> None:
+    """写入紧凑格式的 JSON 文件（保留中文）：优先使用 orjson，遇到其不支持的数据时回退到标准库"""
+    try:
+        data = orjson.dumps(obj, option=_ORJSON_OPTIONS)
+    except orjson.JSONEncodeError:
+        data = json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _dump_line(obj: Any) -> bytes:
+    """把对象序列化为 JSONL 中的一行（含结尾换行符）"""
+    try:
+        data = orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    except orjson.JSONEncodeError:
+        data = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+    return data + b"\n"
+
 
 class HistoryManager:
     """评测历史记录管理器"""
@@ -26,9 +90,24 @@ class HistoryManager:
             history_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "history")
 
         self.history_dir = history_dir
-        self.history_file = os.path.join(history_dir, "evaluation_history.json")
+        # 摘要记录以追加写入的 JSONL 索引保存（旧到新），新增记录时不再重写整个文件
+        self.history_file = os.path.join(history_dir, "evaluation_history.jsonl")
         os.makedirs(self.history_dir, exist_ok=True)
 
+        # 查询缓存（LRU）：key -> (过期时间, 结果)，任何写入历史文件的操作都会清空
+        self._query_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+
+        # 索引文件解析结果的缓存：(文件状态, 记录列表(新到旧), id -> 记录, 删除标记数)，文件变化后重新解析
+        self._index_cache: Optional[tuple] = None
+        self._index_lock = threading.Lock()
+        # 按时间倒序排列的记录：(对应的索引记录列表, 排序结果, id -> 下标)
+        self._sorted_cache: Optional[tuple] = None
+        # 串行化进程内对索引文件的写入（追加与重写）；可重入，以便压缩时在读取-过滤-重写全程持有
+        self._write_lock = threading.RLock()
+
+        self._migrate_legacy_history()
+
     def add_record(self, evaluation_result: Dict[str, Any]) -> str:
         """
         添加评测记录
@@ -40,45 +119,40 @@ class HistoryManager:
             记录ID
         """
         try:
-            # 读取现有历史记录
-            history = self._load_history()
-
-            # 生成记录ID
-            record_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{evaluation_result.get('script_name', 'unknown')}"
+            # 生成记录ID（记录ID与时间戳使用同一时刻）
+            now = datetime.now()
+            record_id = f"{now.strftime('%Y%m%d_%H%M%S')}_{evaluation_result.get('script_name', 'unknown')}"
 
             # 保存完整的评测结果到单独的文件
             result_file = os.path.join(self.history_dir, f"{record_id}.json")
-            with open(result_file, 'w', encoding='utf-8') as f:
-                json.dump(evaluation_result, f, ensure_ascii=False, indent=2)
+            _write_json(result_file, evaluation_result)
 
-            # 创建摘要记录
+            # 创建摘要记录（评测摘要不再存储，读取时由 get_summary 按需生成）
+            overall = evaluation_result.get('overall', {})
+            dimensions = {
+                key: {
+                    'name': dim.get('dimension_name', key),
+                    'score': dim.get('total_score', 0),
+                    'max_score': dim.get('max_score', 100)
+                }
+                for key, dim in evaluation_result.get('dimensions', {}).items()
+            }
             record = {
                 'id': record_id,
                 'type': evaluation_result.get('type', 'script_evaluation'),  # 添加类型字段
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': now.isoformat(),
                 'script_name': evaluation_result.get('script_name', ''),
-                'overall_score': evaluation_result.get('overall', {}).get('total_score', 0),
-                'overall_max_score': evaluation_result.get('overall', {}).get('max_score', 100),
-                'level': evaluation_result.get('overall', {}).get('level', ''),
-                'dimensions': {
-                    key: {
-                        'name': dim.get('dimension_name', key),
-                        'score': dim.get('total_score', 0),
-                        'max_score': dim.get('max_score', 100)
-                    }
-                    for key, dim in evaluation_result.get('dimensions', {}).items()
-                },
+                'overall_score': overall.get('total_score', 0),
+                'overall_max_score': overall.get('max_score', 100),
+                'level': overall.get('level', ''),
+                'dimensions': dimensions,
                 'script_path': evaluation_result.get('script_path', ''),
                 'report_files': evaluation_result.get('report_files', []),
-                'result_file': result_file,  # 保存完整结果文件路径
-                'summary': self._generate_summary(evaluation_result)
+                'result_file': result_file  # 保存完整结果文件路径
             }
 
-            # 添加到历史记录
-            history['records'].insert(0, record)  # 最新的在前面
-
-            # 保存历史记录
-            self._save_history(history)
+            # 追加到历史记录索引
+            self._append_lines([record])
 
             logger.info(f"添加评测记录: {record_id}")
             return record_id
@@ -88,39 +162,54 @@ class HistoryManager:
             raise
 
     def get_records(self, limit: int = 50, offset: int = 0,
-                    search: str = None) -> Dict[str, Any]:
+                    search: str = None, cursor: str = None) -> Dict[str, Any]:
         """
         获取评测记录列表
 
         Args:
             limit: 返回数量限制
-            offset: 偏移量
+            offset: 偏移量（兼容旧接口，提供 cursor 时忽略）
             search: 搜索关键词（剧本名称）
+            cursor: 分页游标，取上一页返回的 next_cursor，从该记录之后继续返回
 
         Returns:
-            记录列表
+            记录列表，next_cursor 为下一页的游标（没有更多记录时为 None）
         """
+        cache_key = ('records', limit, offset, search, cursor)
+        cached = self._get_cached_query(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            history = self._load_history()
-            records = history.get('records', [])
+            # 按时间倒序排列（最近的在前面），排序结果随索引缓存复用
+            records, positions = self._records_by_time()
 
-            # 搜索过滤
+            # 搜索过滤（排序是稳定的，先排序后过滤与先过滤后排序结果相同）
             if search:
-                records = [r for r in records if search.lower() in r.get('script_name', '').lower()]
-
-            # 按时间倒序排序（最近的在前面）
-            records = sorted(records, key=lambda x: x.get('timestamp', ''), reverse=True)
+                keyword = search.lower()
+                records = [r for r in records if keyword in r.get('script_name', '').lower()]
+                positions = None
 
-            # 分页
+            # 分页：有游标时直接定位到游标记录之后，无需按偏移量从头数
+            if cursor:
+                offset = self._cursor_position(records, cursor, positions)
             total = len(records)
-            records = records[offset:offset + limit]
+            records = [self._with_summary(r) for r in records[offset:offset + limit]]
 
-            return {
+            next_cursor = None
+            if records and offset + len(records) < total:
+                last = records[-1]
+                next_cursor = f"{last.get('timestamp', '')}|{last.get('id', '')}"
+
+            result = {
                 'records': records,
                 'total': total,
                 'limit': limit,
-                'offset': offset
+                'offset': offset,
+                'next_cursor': next_cursor
             }
+            self._set_cached_query(cache_key, result)
+            return result
 
         except Exception as e:
             logger.error(f"获取评测记录失败: {str(e)}")
@@ -128,7 +217,8 @@ class HistoryManager:
                 'records': [],
                 'total': 0,
                 'limit': limit,
-                'offset': offset
+                'offset': offset,
+                'next_cursor': None
             }
 
     def get_record(self, record_id: str, load_full: bool = False) -> Optional[Dict[str, Any]]:
@@ -143,22 +233,19 @@ class HistoryManager:
             记录详情，如果不存在返回None
         """
         try:
-            history = self._load_history()
-            records = history.get('records', [])
-
-            for record in records:
-                if record.get('id') == record_id:
-                    # 如果需要加载完整结果
-                    if load_full and record.get('result_file'):
-                        result_file = record['result_file']
-                        if os.path.exists(result_file):
-                            with open(result_file, 'r', encoding='utf-8') as f:
-                                return json.load(f)
-                        else:
-                            logger.warning(f"结果文件不存在: {result_file}")
-                    return record
-
-            return None
+            _, by_id, _ = self._read_index()
+            record = by_id.get(record_id)
+            if record is None:
+                return None
+
+            # 如果需要加载完整结果
+            if load_full and record.get('result_file'):
+                result_file = record['result_file']
+                if os.path.exists(result_file):
+                    return _read_json(result_file)
+                else:
+                    logger.warning(f"结果文件不存在: {result_file}")
+            return self._with_summary(record)
 
         except Exception as e:
             logger.error(f"获取评测记录详情失败: {str(e)}")
@@ -176,18 +263,20 @@ class HistoryManager:
             是否更新成功
         """
         try:
-            history = self._load_history()
-            records = history.get('records', [])
-
-            # 找到要更新的记录
-            for i, record in enumerate(records):
-                if record.get('id') == record_id:
-                    # 更新记录
-                    records[i] = updated_data
-                    # 保存到文件
-                    self._save_history(history)
-                    logger.info(f"更新记录成功: {record_id}")
-                    return True
+            # 在写锁内完成读取-修改-重写，避免丢失读取之后并发追加的记录
+            with self._write_lock:
+                history = self._load_history()
+                records = history.get('records', [])
+
+                # 找到要更新的记录
+                for i, record in enumerate(records):
+                    if record.get('id') == record_id:
+                        # 更新记录
+                        records[i] = updated_data
+                        # 保存到文件
+                        self._save_history(history)
+                        logger.info(f"更新记录成功: {record_id}")
+                        return True
 
             logger.warning(f"未找到要更新的记录: {record_id}")
             return False
@@ -207,16 +296,10 @@ class HistoryManager:
             是否删除成功
         """
         try:
-            history = self._load_history()
-            records = history.get('records', [])
+            records, by_id, tombstones = self._read_index()
 
             # 找到要删除的记录
-            target_record = None
-            for r in records:
-                if r.get('id') == record_id:
-                    target_record = r
-                    break
-
+            target_record = by_id.get(record_id)
             if not target_record:
                 return False  # 没有找到要删除的记录
 
@@ -229,10 +312,14 @@ class HistoryManager:
                 except Exception as e:
                     logger.warning(f"删除结果文件失败: {str(e)}")
 
-            # 过滤掉要删除的记录
-            new_records = [r for r in records if r.get('id') != record_id]
-            history['records'] = new_records
-            self._save_history(history)
+            # 追加删除标记，删除标记过多时重写索引文件
+            if tombstones + 1 > _TOMBSTONE_COMPACT_THRESHOLD:
+                # 在写锁内重新读取索引再重写，避免丢失读取之后并发追加的记录
+                with self._write_lock:
+                    records, _, _ = self._read_index()
+                    self._save_history({'records': [r for r in records if r.get('id') != record_id]})
+            else:
+                self._append_lines([{'_tombstone': record_id}])
 
             logger.info(f"删除评测记录: {record_id}")
             return True
@@ -249,8 +336,10 @@ class HistoryManager:
             是否清空成功
         """
         try:
-            history = {'records': []}
-            self._save_history(history)
+            # 与追加、压缩等写入串行执行，清空期间不会有写入穿插其中
+            with self._write_lock:
+                history = {'records': []}
+                self._save_history(history)
 
             logger.info("清空所有评测记录")
             return True
@@ -266,9 +355,13 @@ class HistoryManager:
         Returns:
             统计信息
         """
+        cache_key = ('statistics',)
+        cached = self._get_cached_query(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            history = self._load_history()
-            records = history.get('records', [])
+            records, _, _ = self._read_index()
 
             total = len(records)
 
@@ -279,24 +372,40 @@ class HistoryManager:
                     'score_distribution': {}
                 }
 
-            # 计算平均分
-            scores = [r.get('overall_score', 0) for r in records]
-            avg_score = sum(scores) / total
+            # 一次遍历同时计算总分和分数分布（NaN 等无法比较的分数不计入任何区间）
+            score_sum = 0
+            excellent = good = passing = poor = failed = 0
+            for r in records:
+                s = r.get('overall_score', 0)
+                score_sum += s
+                if s >= 80:
+                    excellent += 1
+                elif s >= 60:
+                    good += 1
+                elif s >= 40:
+                    passing += 1
+                elif s >= 20:
+                    poor += 1
+                elif s < 20:
+                    failed += 1
+            avg_score = score_sum / total
 
             # 分数分布
             distribution = {
-                '优秀(80-100)': len([s for s in scores if s >= 80]),
-                '良好(60-79)': len([s for s in scores if 60 <= s < 80]),
-                '及格(40-59)': len([s for s in scores if 40 <= s < 60]),
-                '较差(20-39)': len([s for s in scores if 20 <= s < 40]),
-                '失败(0-19)': len([s for s in scores if s < 20])
+                '优秀(80-100)': excellent,
+                '良好(60-79)': good,
+                '及格(40-59)': passing,
+                '较差(20-39)': poor,
+                '失败(0-19)': failed
             }
 
-            return {
+            result = {
                 'total_evaluations': total,
                 'average_score': round(avg_score, 2),
                 'score_distribution': distribution
             }
+            self._set_cached_query(cache_key, result)
+            return result
 
         except Exception as e:
             logger.error(f"获取统计信息失败: {str(e)}")
@@ -307,45 +416,246 @@ class HistoryManager:
             }
 
     def _load_history(self) -> Dict[str, Any]:
-        """加载历史记录"""
-        if os.path.exists(self.history_file):
-            try:
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.error(f"加载历史记录文件失败: {str(e)}")
+        """加载历史记录（records 按新到旧排列，返回的列表可由调用方修改）"""
+        try:
+            records, _, _ = self._read_index()
+            return {'records': list(records)}
+        except Exception as e:
+            logger.error(f"加载历史记录文件失败: {str(e)}")
 
         return {'records': []}
 
+    def _read_index(self) -> tuple:
+        """
+        解析索引文件，文件未变化时直接返回上次的解析结果
+
+        Returns:
+            (记录列表（新到旧）, id -> 记录（同 id 取最新一条）, 删除标记数)
+        """
+        try:
+            st = os.stat(self.history_file)
+        except FileNotFoundError:
+            return [], {}, 0
+        signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+        with self._index_lock:
+            if self._index_cache is not None and self._index_cache[0] == signature:
+                return self._index_cache[1:]
+
+            entries = []
+            with open(self.history_file, 'rb', buffering=_INDEX_READ_BUFFER_SIZE) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            # 写入中断留下的残行，跳过
+                            logger.warning("跳过历史记录索引中无法解析的行")
+                            continue
+                    if isinstance(entry, dict):
+                        entries.append(entry)
+
+            self._index_cache = (signature,) + self._build_index([], 0, entries)
+            return self._index_cache[1:]
+
+    def _records_by_time(self) -> tuple:
+        """
+        返回按时间倒序排列的记录，索引未变化时复用上次的排序结果（调用方不应修改返回的结果）
+
+        Returns:
+            (排序后的记录列表, id -> 在列表中的下标)
+        """
+        records, _, _ = self._read_index()
+        cache = self._sorted_cache
+        if cache is not None and cache[0] is records:
+            return cache[1], cache[2]
+        # 记录通常已按时间倒序排列（导入的旧记录除外），Timsort 在这种输入上接近线性
+        sorted_records = sorted(records, key=lambda x: x.get('timestamp', ''), reverse=True)
+        positions = {}
+        for i, record in enumerate(sorted_records):
+            positions.setdefault(record.get('id'), i)
+        self._sorted_cache = (records, sorted_records, positions)
+        return sorted_records, positions
+
+    @staticmethod
+    def _cursor_position(records: List[Dict[str, Any]], cursor: str,
+                         positions: Optional[Dict[str, int]] = None) -> int:
+        """
+        计算游标之后第一条记录的下标
+
+        Args:
+            records: 按时间倒序排列的记录
+            cursor: 游标，格式为 "时间戳|记录ID"
+            positions: id -> 下标（为 None 时在 records 中顺序查找）
+
+        Returns:
+            下一页起始下标
+        """
+        timestamp, _, record_id = cursor.partition('|')
+        if positions is not None:
+            index = positions.get(record_id)
+        else:
+            index = next((i for i, r in enumerate(records) if r.get('id') == record_id), None)
+        if index is not None:
+            return index + 1
+
+        # 游标对应的记录已被删除：从第一条早于游标时间的记录开始
+        return next((i for i, r in enumerate(records) if r.get('timestamp', '') < timestamp), len(records))
+
+    @staticmethod
+    def _build_index(records: List[Dict[str, Any]], tombstones: int,
+                     entries: List[Dict[str, Any]]) -> tuple:
+        """
+        在已有记录（新到旧）上按顺序应用索引文件中的记录和删除标记
+
+        Returns:
+            (记录列表（新到旧）, id -> 记录, 删除标记数)
+        """
+        records = records[::-1]
+        for entry in entries:
+            if '_tombstone' in entry:
+                tombstones += 1
+                deleted_id = entry['_tombstone']
+                records = [r for r in records if r.get('id') != deleted_id]
+            else:
+                records.append(entry)
+        records.reverse()
+
+        by_id = {}
+        for record in records:
+            by_id.setdefault(record.get('id'), record)
+        return records, by_id, tombstones
+
+    def _append_lines(self, entries: List[Dict[str, Any]]) -> None:
+        """向索引文件末尾追加记录或删除标记（一次写入，不读取已有内容），并同步更新内存索引"""
+        data = b"".join(_dump_line(entry) for entry in entries)
+        try:
+            with self._write_lock:
+                with open(self.history_file, 'ab') as f:
+                    start = f.tell()
+                    f.write(data)
+                st = os.stat(self.history_file)
+
+                # 内存索引正好对应追加前的文件内容时直接应用新条目，无需重新解析整个文件；
+                # 否则（其他进程也写入了）等下次读取时按文件状态重新解析
+                with self._index_lock:
+                    cache = self._index_cache
+                    if (cache is not None and cache[0][0] == st.st_ino and cache[0][2] == start
+                            and st.st_size == start + len(data)):
+                        signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+                        self._index_cache = (signature,) + self._build_index(cache[1], cache[3], entries)
+        finally:
+            self._invalidate_query_cache()
+
+    def _migrate_legacy_history(self) -> None:
+        """把旧版 evaluation_history.json 转换为 JSONL 索引（仅在索引文件不存在时执行，旧文件保留）"""
+        legacy_file = os.path.join(self.history_dir, "evaluation_history.json")
+        if os.path.exists(self.history_file) or not os.path.exists(legacy_file):
+            return
+        try:
+            history = _read_json(legacy_file)
+            self._save_history({'records': history.get('records', [])})
+            logger.info(f"已将历史记录迁移到 {self.history_file}")
+        except Exception as e:
+            logger.error(f"迁移旧版历史记录失败: {str(e)}")
+
+    def _get_cached_query(self, key: tuple) -> Optional[Dict[str, Any]]:
+        """获取未过期的查询缓存，不存在或已过期返回None"""
+        with self._query_cache_lock:
+            entry = self._query_cache.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._query_cache[key]
+                return None
+            self._query_cache.move_to_end(key)
+            return entry[1]
+
+    def _set_cached_query(self, key: tuple, value: Dict[str, Any]) -> None:
+        """写入查询缓存，同时清理已过期的条目，并把条目数限制在 _QUERY_CACHE_SIZE 以内"""
+        now = time.monotonic()
+        with self._query_cache_lock:
+            expired = [k for k, (expires_at, _) in self._query_cache.items() if expires_at < now]
+            for k in expired:
+                del self._query_cache[k]
+            self._query_cache[key] = (now + _QUERY_CACHE_TTL, value)
+            self._query_cache.move_to_end(key)
+            while len(self._query_cache) > _QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+
+    def _invalidate_query_cache(self) -> None:
+        """清空查询缓存"""
+        with self._query_cache_lock:
+            self._query_cache.clear()
+
     def _save_history(self, history: Dict[str, Any]) -> None:
-        """保存历史记录"""
+        """重写整个索引文件（history['records'] 按新到旧排列），写入临时文件并落盘后原子替换，中途崩溃不会损坏原文件"""
+        data = b"".join(_dump_line(record) for record in reversed(history.get('records', [])))
+        # 临时文件按进程区分，避免多个工作进程同时重写时互相覆盖
+        tmp_file = f"{self.history_file}.{os.getpid()}.tmp"
         try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(history, f, ensure_ascii=False, indent=2)
+            with self._write_lock:
+                with open(tmp_file, 'wb') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.history_file)
         except Exception as e:
             logger.error(f"保存历史记录文件失败: {str(e)}")
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
             raise
+        finally:
+            # 写入完成后再清空，避免并发读取把旧数据重新放进缓存
+            self._invalidate_query_cache()
 
-    def _generate_summary(self, evaluation_result: Dict[str, Any]) -> str:
-        """生成评测摘要"""
+    def get_summary(self, record: Dict[str, Any]) -> str:
+        """
+        根据摘要记录中的综合评分和各维度得分生成评测摘要
+
+        Args:
+            record: 摘要记录
+
+        Returns:
+            摘要文本
+        """
+        overall = {
+            'total_score': record.get('overall_score', 0),
+            'max_score': record.get('overall_max_score', 100),
+            'level': record.get('level', '')
+        }
+        return self._generate_summary(overall, record.get('dimensions', {}))
+
+    def _with_summary(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """返回带 summary 字段的记录（旧记录已存有摘要时直接返回，不修改缓存中的记录）"""
+        if 'summary' in record:
+            return record
+        return {**record, 'summary': self.get_summary(record)}
+
+    def _generate_summary(self, overall: Dict[str, Any], dimensions: Dict[str, Dict[str, Any]]) -> str:
+        """
+        生成评测摘要
+
+        Args:
+            overall: 评测结果中的综合评分
+            dimensions: 各维度摘要（key -> {'name', 'score', 'max_score'}）
+
+        Returns:
+            摘要文本
+        """
         try:
-            overall = evaluation_result.get('overall', {})
             score = overall.get('total_score', 0)
             max_score = overall.get('max_score', 100)
             level = overall.get('level', '')
 
-            # 获取最弱的3个维度
-            dimensions = evaluation_result.get('dimensions', {})
-            dim_list = [
-                {
-                    'name': dim.get('dimension_name', key),
-                    'score': dim.get('total_score', 0)
-                }
-                for key, dim in dimensions.items()
-            ]
-            dim_list.sort(key=lambda x: x['score'])
-
-            weak_dims = dim_list[:3] if len(dim_list) >= 3 else dim_list
+            # 获取最弱的3个维度（nsmallest 与稳定排序后取前 3 个结果相同）
+            weak_dims = heapq.nsmallest(3, dimensions.values(), key=lambda d: d['score'])
 
             summary = f"总分: {score}/{max_score} ({level})\n"
             if weak_dims:
@@ -388,9 +698,10 @@ class HistoryManager:
                     'message': f'outputs目录不存在: {outputs_dir}'
                 }
 
-            # 获取所有JSON文件
-            json_files = [f for f in os.listdir(outputs_dir) if f.endswith('.json')]
-            total = len(json_files)
+            # 获取所有JSON文件（scandir 条目会缓存 stat 结果，修改时间只需查询一次）
+            with os.scandir(outputs_dir) as it:
+                json_entries = [entry for entry in it if entry.name.endswith('.json')]
+            total = len(json_entries)
 
             if total == 0:
                 return {
@@ -405,24 +716,23 @@ class HistoryManager:
             imported = 0
             skipped = 0
             failed = 0
-            existing_record_ids = set()
+            new_records = []
 
             # 获取现有的记录ID
-            history = self._load_history()
-            for record in history.get('records', []):
-                existing_record_ids.add(record.get('id'))
+            _, by_id, _ = self._read_index()
+            existing_record_ids = set(by_id)
 
-            # 遍历所有JSON文件
-            for json_file in json_files:
+            # 遍历所有JSON文件（文件读取和解析在线程池中并行进行，去重和写入按文件顺序串行处理）
+            for entry, future in self._read_output_files(json_entries):
+                json_file = entry.name
                 try:
-                    file_path = os.path.join(outputs_dir, json_file)
+                    file_path = entry.path
 
                     # 读取评测结果
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        evaluation_result = json.load(f)
+                    evaluation_result = future.result()
 
                     # 检查是否是有效的评测结果
-                    if not self._is_valid_evaluation_result(evaluation_result):
+                    if evaluation_result is None or not self._is_valid_evaluation_result(evaluation_result):
                         logger.warning(f"跳过无效的评测结果文件: {json_file}")
                         skipped += 1
                         continue
@@ -430,16 +740,15 @@ class HistoryManager:
                     # 生成记录ID（基于文件名的时间戳）
                     script_name = evaluation_result.get('script_name', 'unknown')
                     timestamp = json_file.replace('.json', '')
+                    modified = datetime.fromtimestamp(entry.stat().st_mtime)
 
                     # 尝试从文件名提取时间戳
-                    import re
-                    time_match = re.search(r'(\d{8}_\d{6})', timestamp)
+                    time_match = _FILENAME_TIMESTAMP_RE.search(timestamp)
                     if time_match:
                         record_id = f"{time_match.group(1)}_{script_name}"
                     else:
                         # 使用文件的修改时间
-                        mtime = os.path.getmtime(file_path)
-                        record_id = f"{datetime.fromtimestamp(mtime).strftime('%Y%m%d_%H%M%S')}_{script_name}"
+                        record_id = f"{modified.strftime('%Y%m%d_%H%M%S')}_{script_name}"
 
                     # 检查是否已存在
                     if record_id in existing_record_ids:
@@ -447,36 +756,36 @@ class HistoryManager:
                         skipped += 1
                         continue
 
-                    # 保存完整的评测结果到单独的文件
+                    # 保存完整的评测结果到单独的文件（源文件已是 JSON，直接复制字节，无需重新序列化）
                     result_file = os.path.join(self.history_dir, f"{record_id}.json")
-                    with open(result_file, 'w', encoding='utf-8') as f:
-                        json.dump(evaluation_result, f, ensure_ascii=False, indent=2)
-
-                    # 创建摘要记录
+                    shutil.copyfile(file_path, result_file)
+
+                    # 创建摘要记录（评测摘要不再存储，读取时由 get_summary 按需生成）
+                    overall = evaluation_result.get('overall', {})
+                    dimensions = {
+                        key: {
+                            'name': dim.get('dimension_name', key),
+                            'score': dim.get('total_score', 0),
+                            'max_score': dim.get('max_score', 100)
+                        }
+                        for key, dim in evaluation_result.get('dimensions', {}).items()
+                    }
                     record = {
                         'id': record_id,
-                        'timestamp': datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat(),
+                        'timestamp': modified.isoformat(),
                         'script_name': script_name,
-                        'overall_score': evaluation_result.get('overall', {}).get('total_score', 0),
-                        'overall_max_score': evaluation_result.get('overall', {}).get('max_score', 100),
-                        'level': evaluation_result.get('overall', {}).get('level', ''),
-                        'dimensions': {
-                            key: {
-                                'name': dim.get('dimension_name', key),
-                                'score': dim.get('total_score', 0),
-                                'max_score': dim.get('max_score', 100)
-                            }
-                            for key, dim in evaluation_result.get('dimensions', {}).items()
-                        },
+                        'overall_score': overall.get('total_score', 0),
+                        'overall_max_score': overall.get('max_score', 100),
+                        'level': overall.get('level', ''),
+                        'dimensions': dimensions,
                         'script_path': evaluation_result.get('script_path', ''),
                         'report_files': evaluation_result.get('report_files', []),
                         'result_file': result_file,
-                        'summary': self._generate_summary(evaluation_result),
                         'imported_from': json_file  # 标记来源
                     }
 
                     # 添加到历史记录
-                    history['records'].insert(0, record)
+                    new_records.append(record)
                     existing_record_ids.add(record_id)
                     imported += 1
 
@@ -486,8 +795,9 @@ class HistoryManager:
                     logger.error(f"导入文件失败 {json_file}: {str(e)}")
                     failed += 1
 
-            # 保存历史记录
-            self._save_history(history)
+            # 追加到历史记录索引
+            if new_records:
+                self._append_lines(new_records)
 
             return {
                 'success': True,
@@ -509,6 +819,46 @@ class HistoryManager:
                 'failed': 0
             }
 
+    def _read_output_files(self, entries: List[os.DirEntry]) -> Iterator[Tuple[os.DirEntry, Future]]:
+        """
+        在线程池中并行读取并解析待导入的文件，按原顺序逐个产出
+
+        最多提前提交 2 倍线程数的文件，避免解析结果在内存中堆积。
+
+        Args:
+            entries: 待导入的文件条目
+
+        Yields:
+            (文件条目, 解析任务)，任务结果为解析后的数据，明显无效的文件为 None
+        """
+        with ThreadPoolExecutor(max_workers=_IMPORT_WORKERS, thread_name_prefix="history-import") as executor:
+            remaining = iter(entries)
+            pending = deque()
+            for entry in remaining:
+                pending.append((entry, executor.submit(self._read_output_file, entry.path)))
+                if len(pending) >= _IMPORT_WORKERS * 2:
+                    break
+            while pending:
+                yield pending.popleft()
+                entry = next(remaining, None)
+                if entry is not None:
+                    pending.append((entry, executor.submit(self._read_output_file, entry.path)))
+
+    @staticmethod
+    def _read_output_file(path: str) -> Any:
+        """
+        读取并解析待导入的文件
+
+        评测结果的 dimensions 键紧跟在 script_name 等元数据之后写出，
+        文件开头一段内连 overall / dimensions 键名都不包含的文件视为无效，不再读取其余内容，直接返回 None
+        """
+        with open(path, 'rb') as f:
+            data = f.read(_IMPORT_SNIFF_BYTES)
+            if b'"overall"' not in data and b'"dimensions"' not in data:
+                return None
+            data += f.read()
+        return _parse_json(data)
+
     def _is_valid_evaluation_result(self, data: Dict[str, Any]) -> bool:
         """检查是否是有效的评测结果"""
         # 必须包含overall或dimensions
@@ -3,10 +3,16 @@
 生成符合《短剧商业潜力评估报告》格式的评测报告
 """
 
+import io
 import os
 import json
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
 
 
 class NewReportGenerator:
@@ -36,9 +42,23 @@ class NewReportGenerator:
         Returns:
             生成的文件路径列表
         """
-        import logging
-        logger = logging.getLogger(__name__)
+        return [path for path, _ in self.generate_with_contents(evaluation_result, formats)]
+
+    def generate_with_contents(
+        self,
+        evaluation_result: Dict[str, Any],
+        formats: List[str] = None
+    ) -> List[Tuple[str, Optional[str]]]:
+        """
+        生成评测报告，并返回文本格式报告写入的内容（供调用方缓存，无需再从磁盘读回）
 
+        Args:
+            evaluation_result: 评测结果
+            formats: 输出格式列表 ["markdown", "json"]
+
+        Returns:
+            (文件路径, 文本内容) 列表；PDF 等二进制格式的内容为 None
+        """
         if formats is None:
             formats = ["markdown"]
 
@@ -47,31 +67,29 @@ class NewReportGenerator:
 
         logger.info(f"开始生成新版报告: {script_name}, 格式: {formats}")
 
-        generated_files = []
-
+        # 按格式顺序收集需要生成的报告
+        tasks = []
         if "markdown" in formats:
-            logger.info("生成 Markdown 报告...")
-            md_path = self._generate_markdown(evaluation_result, script_name, timestamp)
-            generated_files.append(md_path)
-            logger.info(f"Markdown 报告已生成: {md_path}")
-
+            tasks.append(("Markdown", self._generate_markdown))
         if "json" in formats:
-            logger.info("生成 JSON 报告...")
-            json_path = self._generate_json(evaluation_result, script_name, timestamp)
-            generated_files.append(json_path)
-            logger.info(f"JSON 报告已生成: {json_path}")
-
+            tasks.append(("JSON", self._generate_json))
         if "pdf" in formats:
-            logger.info("生成 PDF 报告...")
-            pdf_path = self._generate_pdf(evaluation_result, script_name, timestamp)
-            generated_files.append(pdf_path)
-            logger.info(f"PDF 报告已生成: {pdf_path}")
-
+            tasks.append(("PDF", self._generate_pdf))
         if "word" in formats or "docx" in formats:
-            logger.info("生成 Word 报告...")
-            word_path = self._generate_word(evaluation_result, script_name, timestamp)
-            generated_files.append(word_path)
-            logger.info(f"Word 报告已生成: {word_path}")
+            tasks.append(("Word", self._generate_word))
+
+        # 各格式相互独立且只读评测结果，并行生成；结果按格式顺序返回
+        generated_files = []
+        with ThreadPoolExecutor(max_workers=max(1, len(tasks))) as executor:
+            futures = []
+            for label, method in tasks:
+                logger.info(f"生成 {label} 报告...")
+                futures.append((label, executor.submit(method, evaluation_result, script_name, timestamp)))
+
+            for label, future in futures:
+                path, content = future.result()
+                generated_files.append((path, content))
+                logger.info(f"{label} 报告已生成: {path}")
 
         logger.info(f"所有报告生成完成: {len(generated_files)} 个文件")
         return generated_files
@@ -81,7 +99,7 @@ class NewReportGenerator:
         result: Dict[str, Any],
         script_name: str,
         timestamp: str
-    ) -> str:
+    ) -> Tuple[str, Optional[str]]:
         """
         生成 Markdown 格式报告 - PDF格式
 
@@ -91,18 +109,16 @@ class NewReportGenerator:
             timestamp: 时间戳
 
         Returns:
-            生成的文件路径
+            (生成的文件路径, 报告内容)
         """
-        import logging
-        logger = logging.getLogger(__name__)
-
         filename = f"{script_name}_评估报告_{timestamp}.md"
         filepath = os.path.join(self.output_dir, filename)
 
         logger.info(f"准备生成新版 Markdown 报告: {filename}")
 
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
+            # 先在内存中组装报告，再一次性写入文件
+            with io.StringIO() as f:
                 # 标题
                 f.write(f"# 《短剧商业潜力评估报告》\n\n")
                 f.write(f"**AI 智能诊断｜商业适配度·结构风险·变现潜力**\n\n")
@@ -127,13 +143,16 @@ class NewReportGenerator:
 
                 f.write("\n---\n")
                 f.write("*本报告由 AI 剧本评测系统生成，仅供参考。建议结合专业人工评审进行最终决策。*\n")
+                content = f.getvalue()
+
+            with open(filepath, 'w', encoding='utf-8') as out:
+                out.write(content)
 
             logger.info(f"Markdown 报告生成成功: {filepath}")
-            return filepath
+            return filepath, content
 
         except Exception as e:
             logger.error(f"生成 Markdown 报告失败: {str(e)}")
-            import traceback
             logger.error(traceback.format_exc())
             raise
 
@@ -1115,30 +1134,31 @@ class NewReportGenerator:
         result: Dict[str, Any],
         script_name: str,
         timestamp: str
-    ) -> str:
-        """生成JSON格式报告"""
+    ) -> Tuple[str, Optional[str]]:
+        """生成JSON格式报告，返回 (文件路径, 报告内容)"""
         filename = f"{script_name}_评估报告_{timestamp}.json"
         filepath = os.path.join(self.output_dir, filename)
 
+        content = json.dumps(result, ensure_ascii=False, indent=2)
         with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
+            f.write(content)
 
-        return filepath
+        return filepath, content
 
     def _generate_word(
         self,
         result: Dict[str, Any],
         script_name: str,
         timestamp: str
-    ) -> str:
-        """生成Word格式报告（占位）"""
+    ) -> Tuple[str, Optional[str]]:
+        """生成Word格式报告（占位），返回 (文件路径, None)"""
         # TODO: 实现Word生成
         filename = f"{script_name}_评估报告_{timestamp}.docx"
         filepath = os.path.join(self.output_dir, filename)
         # 创建空文件
         with open(filepath, 'w') as f:
             f.write("Word报告生成功能待实现")
-        return filepath
+        return filepath, None
 
     def _get_grade_from_score(self, score: float) -> str:
         """根据分数获取等级"""
@@ -1162,11 +1182,8 @@ class NewReportGenerator:
         result: Dict[str, Any],
         script_name: str,
         timestamp: str
-    ) -> str:
-        """生成PDF格式报告 - 使用reportlab和中文字体"""
-        import logging
-        logger = logging.getLogger(__name__)
-
+    ) -> Tuple[str, Optional[str]]:
+        """生成PDF格式报告 - 使用reportlab和中文字体，返回 (文件路径, None)"""
         filename = f"{script_name}_评估报告_{timestamp}.pdf"
         filepath = os.path.join(self.output_dir, filename)
 
@@ -1359,11 +1376,10 @@ class NewReportGenerator:
             doc.build(story)
 
             logger.info(f"PDF 报告生成成功: {filepath}")
-            return filepath
+            return filepath, None
 
         except Exception as e:
             logger.error(f"生成 PDF 报告失败: {str(e)}")
-            import traceback
             logger.error(traceback.format_exc())
             raise
 
@@ -3,13 +3,73 @@
 支持AI生成小说、评测小说、剧本改小说、AI改进小说
 """
 
+import os
+import re
 import json
+import orjson
 import logging
+from functools import lru_cache
 from typing import Dict, Any, List, Optional
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# 模板占位符，如 {genre}；模板中其他花括号（如 JSON 示例）不受影响
+_PLACEHOLDER_RE = re.compile(r'\{(\w+)\}')
+
+
+def _fill_template(template: str, values: Dict[str, str]) -> str:
+    """
+    一次扫描替换模板中的占位符（未提供值的占位符保持原样，替换进来的内容不会再被替换）
+
+    Args:
+        template: 模板内容
+        values: 占位符名 -> 替换内容
+
+    Returns:
+        替换后的内容
+    """
+    return _PLACEHOLDER_RE.sub(lambda m: values.get(m.group(1), m.group(0)), template)
+
+
+# JSON 对象或数组的开头（允许前导空白）
+_JSON_START_RE = re.compile(r'\s*[\[{]')
+
+
+def _loads_json_response(text: str) -> Any:
+    """
+    解析 AI 返回的 JSON：明显是纯文本的响应直接判定失败，不做完整解析；
+    解析优先使用 orjson，失败时回退到标准库（兼容 NaN 等）
+
+    Args:
+        text: AI 响应文本
+
+    Returns:
+        解析结果
+
+    Raises:
+        json.JSONDecodeError: 响应不是 JSON
+    """
+    if not _JSON_START_RE.match(text):
+        raise json.JSONDecodeError("响应不是 JSON 对象或数组", text, 0)
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        return json.loads(text)
+
+
+@lru_cache(maxsize=16)
+def _read_prompt_template(path: str, mtime_ns: int, size: int) -> str:
+    """读取提示词模板（按路径、修改时间和大小缓存，文件修改后自动重新读取）"""
+    return Path(path).read_text(encoding='utf-8')
+
+
+@lru_cache(maxsize=4)
+def _list_prompt_names(directory: str, mtime_ns: int) -> frozenset:
+    """列出模板目录中的文件名（按目录修改时间缓存，新增/删除/重命名模板后自动重新扫描）"""
+    with os.scandir(directory) as it:
+        return frozenset(entry.name for entry in it)
+
 
 class NovelGenerator:
     """小说生成器"""
@@ -24,6 +84,37 @@ class NovelGenerator:
         self.ai_client = ai_client
         self.prompts_dir = Path(__file__).parent.parent / "prompts" / "novel"
 
+    def _resolve_prompt_file(self, *candidates: str) -> Path:
+        """
+        按顺序选择第一个存在的模板文件
+
+        Args:
+            candidates: 候选文件名
+
+        Returns:
+            模板文件路径（都不存在时返回最后一个候选）
+        """
+        # 只需 stat 一次目录：目录未变化时复用进程内缓存的文件名列表，不再逐个检查文件是否存在
+        try:
+            prompt_names = _list_prompt_names(os.fspath(self.prompts_dir), os.stat(self.prompts_dir).st_mtime_ns)
+        except FileNotFoundError:
+            prompt_names = frozenset()
+        name = next((c for c in candidates if c in prompt_names), candidates[-1])
+        return self.prompts_dir / name
+
+    def _load_prompt_template(self, prompt_file: Path) -> str:
+        """
+        加载提示词模板（进程内缓存）
+
+        Args:
+            prompt_file: 模板文件路径
+
+        Returns:
+            模板内容
+        """
+        st = os.stat(prompt_file)
+        return _read_prompt_template(os.fspath(prompt_file), st.st_mtime_ns, st.st_size)
+
     def generate_novel(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
         AI生成小说
@@ -45,11 +136,9 @@ class NovelGenerator:
 
         try:
             # 读取prompt模板
-            prompt_file = self.prompts_dir / "generate_novel.txt"
-            if not prompt_file.exists():
-                prompt_file = self.prompts_dir / "generate_novel.md"
+            prompt_file = self._resolve_prompt_file("generate_novel.txt", "generate_novel.md")
 
-            prompt_template = prompt_file.read_text(encoding='utf-8')
+            prompt_template = self._load_prompt_template(prompt_file)
 
             # 构建prompt
             prompt = self._build_generation_prompt(prompt_template, params)
@@ -89,26 +178,21 @@ class NovelGenerator:
 
     def _build_generation_prompt(self, template: str, params: Dict[str, Any]) -> str:
         """构建生成prompt"""
-        prompt = template
-
         # 替换参数
         replacements = {
-            '{genre}': params.get('genre', '都市'),
-            '{style}': params.get('style', '轻松'),
-            '{length}': str(params.get('length', 50000)),
-            '{chapters}': str(params.get('chapters', 20)),
-            '{outline}': params.get('outline', '无'),
-            '{characters}': self._format_characters(params.get('characters', [])),
-            '{world_setting}': params.get('world_setting', '无特殊设定'),
-            '{target_audience}': params.get('target_audience', '年轻女性读者'),
-            '{tone}': params.get('tone', '轻松愉快'),
-            '{theme}': params.get('theme', '成长与爱情'),
+            'genre': params.get('genre', '都市'),
+            'style': params.get('style', '轻松'),
+            'length': str(params.get('length', 50000)),
+            'chapters': str(params.get('chapters', 20)),
+            'outline': params.get('outline', '无'),
+            'characters': self._format_characters(params.get('characters', [])),
+            'world_setting': params.get('world_setting', '无特殊设定'),
+            'target_audience': params.get('target_audience', '年轻女性读者'),
+            'tone': params.get('tone', '轻松愉快'),
+            'theme': params.get('theme', '成长与爱情'),
         }
 
-        for old, new in replacements.items():
-            prompt = prompt.replace(old, new)
-
-        return prompt
+        return _fill_template(template, replacements)
 
     def _format_characters(self, characters: List[Dict[str, str]]) -> str:
         """格式化人物设定"""
@@ -128,7 +212,7 @@ class NovelGenerator:
 
         # 尝试解析JSON格式
         try:
-            data = json.loads(response)
+            data = _loads_json_response(response)
             return {
                 'success': True,
                 'title': data.get('title', '未命名小说'),
@@ -188,18 +272,18 @@ class NovelGenerator:
 
         try:
             # 读取prompt模板
-            prompt_file = self.prompts_dir / "script_to_novel.txt"
-            if not prompt_file.exists():
-                prompt_file = self.prompts_dir / "script_to_novel.md"
+            prompt_file = self._resolve_prompt_file("script_to_novel.txt", "script_to_novel.md")
 
-            prompt_template = prompt_file.read_text(encoding='utf-8')
+            prompt_template = self._load_prompt_template(prompt_file)
 
             # 构建prompt
-            prompt = prompt_template.replace('{script_content}', script_content)
-            prompt = prompt.replace('{style}', params.get('style', '详实'))
-            prompt = prompt.replace('{expand_psychology}', str(params.get('expand_psychology', True)))
-            prompt = prompt.replace('{expand_environment}', str(params.get('expand_environment', True)))
-            prompt = prompt.replace('{first_person}', str(params.get('first_person', False)))
+            prompt = _fill_template(prompt_template, {
+                'script_content': script_content,
+                'style': params.get('style', '详实'),
+                'expand_psychology': str(params.get('expand_psychology', True)),
+                'expand_environment': str(params.get('expand_environment', True)),
+                'first_person': str(params.get('first_person', False)),
+            })
 
             # 调用AI改写
             response = self.ai_client.chat(
@@ -238,19 +322,19 @@ class NovelGenerator:
 
         try:
             # 读取prompt模板
-            prompt_file = self.prompts_dir / "improve_novel.txt"
-            if not prompt_file.exists():
-                prompt_file = self.prompts_dir / "improve_novel.md"
+            prompt_file = self._resolve_prompt_file("improve_novel.txt", "improve_novel.md")
 
-            prompt_template = prompt_file.read_text(encoding='utf-8')
+            prompt_template = self._load_prompt_template(prompt_file)
 
             # 提取问题维度
             issues = self._extract_issues(evaluation_result, improvement_focus)
 
             # 构建prompt
-            prompt = prompt_template.replace('{novel_content}', novel_content)
-            prompt = prompt.replace('{issues}', json.dumps(issues, ensure_ascii=False))
-            prompt = prompt.replace('{improvement_focus}', '、'.join(improvement_focus))
+            prompt = _fill_template(prompt_template, {
+                'novel_content': novel_content,
+                'issues': json.dumps(issues, ensure_ascii=False),
+                'improvement_focus': '、'.join(improvement_focus),
+            })
 
             # 调用AI改进
             response = self.ai_client.chat(
@@ -287,12 +371,10 @@ class NovelGenerator:
 
         try:
             # 读取大纲生成prompt模板
-            prompt_file = self.prompts_dir / "generate_outline.txt"
-            if not prompt_file.exists():
-                # 如果没有专门的模板，使用主模板的简化版
-                prompt_file = self.prompts_dir / "generate_novel.txt"
+            # 如果没有专门的模板，使用主模板的简化版
+            prompt_file = self._resolve_prompt_file("generate_outline.txt", "generate_novel.txt")
 
-            prompt_template = prompt_file.read_text(encoding='utf-8')
+            prompt_template = self._load_prompt_template(prompt_file)
 
             # 构建prompt
             prompt = self._build_generation_prompt(prompt_template, params)
@@ -430,7 +512,7 @@ class NovelGenerator:
 
         # 1. 尝试解析JSON格式
         try:
-            data = json.loads(response)
+            data = _loads_json_response(response)
             title = data.get('title')
             if not title:
                 title = data.get('novel_name')
@@ -541,7 +623,7 @@ class NovelGenerator:
         """解析批次章节响应"""
         try:
             # 尝试解析JSON
-            data = json.loads(response)
+            data = _loads_json_response(response)
             return data.get('chapters', [])
         except json.JSONDecodeError:
             # 如果不是JSON，尝试提取文本内容
@@ -642,10 +724,13 @@ class NovelGenerator:
 
         dimensions = evaluation_result.get('dimensions', {})
 
+        # 维度名称只取一次，按名称子串匹配需要逐个比较，保留列表以支持同名维度
+        named_dimensions = [(dim_result.get('dimension_name', ''), dim_result) for dim_result in dimensions.values()]
+
         for area in focus_areas:
             # 查找相关维度的问题
-            for dim_name, dim_result in dimensions.items():
-                if area in dim_result.get('dimension_name', ''):
+            for dimension_name, dim_result in named_dimensions:
+                if area in dimension_name:
                     weaknesses = dim_result.get('weaknesses', [])
                     suggestions = dim_result.get('suggestions', [])
 
@@ -673,11 +758,9 @@ class NovelGenerator:
 
         try:
             # 读取prompt模板
-            prompt_file = self.prompts_dir / "novel_evaluation.txt"
-            if not prompt_file.exists():
-                prompt_file = self.prompts_dir / "novel_evaluation.md"
+            prompt_file = self._resolve_prompt_file("novel_evaluation.txt", "novel_evaluation.md")
 
-            prompt_template = prompt_file.read_text(encoding='utf-8')
+            prompt_template = self._load_prompt_template(prompt_file)
 
             # 构建prompt
             prompt = prompt_template.replace('{novel_content}', novel_content[:10000])  # 限制长度避免token过多
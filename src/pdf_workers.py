@@ -0,0 +1,211 @@
+"""
+PDF 页面并行提取
+在独立的进程池中按页码区间提取 PDF 文本
+
+本模块会被子进程导入，因此只依赖标准库，PDF 库在工作函数内按需导入。
+"""
+
+import os
+import atexit
+import logging
+import threading
+import multiprocessing
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+# 进程池大小
+_PDF_POOL_WORKERS = os.cpu_count() or 1
+
+_pdf_executor = None
+_pdf_executor_lock = threading.Lock()
+
+
+def _open_pdfplumber(file_path: str):
+    """使用 pdfplumber 打开 PDF 文档"""
+    import pdfplumber
+    return closing(pdfplumber.open(file_path))
+
+
+def _pdfplumber_page_count(pdf) -> int:
+    """获取 pdfplumber 文档页数"""
+    return len(pdf.pages)
+
+
+def _pdfplumber_page_texts(pdf, start: int, end: int) -> List[str]:
+    """使用 pdfplumber 提取指定页码范围的文本"""
+    return [pdf.pages[i].extract_text() for i in range(start, end)]
+
+
+def _open_pypdfium2(file_path: str):
+    """使用 pypdfium2 打开 PDF 文档"""
+    import pypdfium2 as pdfium
+    return closing(pdfium.PdfDocument(file_path))
+
+
+def _pypdfium2_page_count(pdf) -> int:
+    """获取 pypdfium2 文档页数"""
+    return len(pdf)
+
+
+def _pypdfium2_page_texts(pdf, start: int, end: int) -> List[str]:
+    """使用 pypdfium2 提取指定页码范围的文本"""
+    page_texts = []
+    for i in range(start, end):
+        page = pdf[i]
+        textpage = page.get_textpage()
+        page_texts.append(textpage.get_text_range())
+        textpage.close()
+        page.close()
+    return page_texts
+
+
+# 支持按页码区间提取的后端：(打开文档, 统计页数, 提取页码区间文本)
+_PDF_BACKENDS = {
+    'pdfplumber': (_open_pdfplumber, _pdfplumber_page_count, _pdfplumber_page_texts),
+    'pypdfium2': (_open_pypdfium2, _pypdfium2_page_count, _pypdfium2_page_texts),
+}
+
+# 页数达到该阈值才使用多进程并行提取，且每个子任务至少分到阈值一半的页数。
+# 并行的固定开销是首次使用时启动进程池，以及每个子任务重新打开一次 PDF；
+# pypdfium2 每页只需几毫秒，几百页以内单进程更快，pdfplumber 每页要几十到上百毫秒，十几页就值得并行。
+# 可通过环境变量 PDF_PARALLEL_MIN_PAGES 统一覆盖（设为很大的值即关闭并行）
+_PDF_PARALLEL_MIN_PAGES = {
+    'pdfplumber': 16,
+    'pypdfium2': 200,
+}
+
+
+def _parallel_min_pages(backend: str) -> int:
+    """获取指定后端启用并行提取的最少页数"""
+    override = os.getenv('PDF_PARALLEL_MIN_PAGES')
+    if override:
+        return max(2, int(override))
+    return _PDF_PARALLEL_MIN_PAGES[backend]
+
+
+def extract_pdf_page_range(backend: str, file_path: str, start: int, end: int) -> List[str]:
+    """
+    提取 PDF 指定页码范围的文本（在子进程中执行）
+
+    页面对象无法跨进程传递，因此每个子进程自行重新打开文件。
+    PDFium 本身不是线程安全的，pypdfium2 同样只能用多进程并行。
+
+    Args:
+        backend: 提取后端名称（见 _PDF_BACKENDS）
+        file_path: PDF 文件路径
+        start: 起始页（包含）
+        end: 结束页（不包含）
+
+    Returns:
+        各页文本列表（保持页面顺序）
+    """
+    open_document, _, page_texts = _PDF_BACKENDS[backend]
+    with open_document(file_path) as pdf:
+        return page_texts(pdf, start, end)
+
+
+def extract_pdf_pages(backend: str, file_path: str) -> List[str]:
+    """
+    提取 PDF 全部页面文本
+
+    页数未达到并行阈值（或只能分成一个子任务）时直接用已打开的文档在当前进程中提取（只打开一次），
+    否则按页码区间分发到进程池并行提取。
+
+    Args:
+        backend: 提取后端名称（见 _PDF_BACKENDS）
+        file_path: PDF 文件路径
+
+    Returns:
+        按页面顺序排列的文本列表
+    """
+    open_document, page_count_of, page_texts = _PDF_BACKENDS[backend]
+    min_pages = _parallel_min_pages(backend)
+    with open_document(file_path) as pdf:
+        page_count = page_count_of(pdf)
+        chunk_size = max(min_pages // 2, -(-page_count // _PDF_POOL_WORKERS))
+        if page_count < min_pages or chunk_size >= page_count:
+            return page_texts(pdf, 0, page_count)
+
+    logger.info(f"PDF 共 {page_count} 页，使用多进程并行提取（{backend}）")
+    ranges = [(start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size)]
+    return extract_pdf_pages_parallel(backend, file_path, ranges)
+
+
+def _mp_context():
+    """
+    进程池使用的启动方式
+
+    Web 服务运行在多线程中，fork 会复制持有锁的线程状态，因此不用 fork：
+    优先使用 forkserver（主模块只在服务进程中导入一次），不支持时使用 spawn。
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def _get_pdf_executor() -> ProcessPoolExecutor:
+    """获取（惰性创建）PDF 提取进程池，多线程并发调用时只创建一次"""
+    global _pdf_executor
+    with _pdf_executor_lock:
+        if _pdf_executor is None:
+            _pdf_executor = ProcessPoolExecutor(max_workers=_PDF_POOL_WORKERS, mp_context=_mp_context())
+        return _pdf_executor
+
+
+def _discard_pdf_executor(executor: ProcessPoolExecutor) -> None:
+    """丢弃已损坏的进程池，下次使用时重新创建"""
+    global _pdf_executor
+    with _pdf_executor_lock:
+        if _pdf_executor is executor:
+            _pdf_executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def shutdown_pdf_executor() -> None:
+    """关闭 PDF 提取进程池（进程退出时自动调用）"""
+    global _pdf_executor
+    with _pdf_executor_lock:
+        executor, _pdf_executor = _pdf_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _map_page_ranges(backend: str, file_path: str, ranges: List[tuple]) -> List[str]:
+    """把页码区间分发到进程池，按页面顺序合并结果"""
+    executor = _get_pdf_executor()
+    try:
+        futures = [executor.submit(extract_pdf_page_range, backend, file_path, start, end) for start, end in ranges]
+        page_texts = []
+        for future in futures:
+            page_texts.extend(future.result())
+        return page_texts
+    except BrokenProcessPool:
+        _discard_pdf_executor(executor)
+        raise
+
+
+def extract_pdf_pages_parallel(backend: str, file_path: str, ranges: List[tuple]) -> List[str]:
+    """
+    在进程池中并行提取各页码区间的文本
+
+    工作进程异常退出导致进程池损坏时，丢弃旧进程池并用新进程池重试一次；
+    再次失败则向上抛出 BrokenProcessPool，由调用方回退到其他提取方式。
+
+    Args:
+        backend: 提取后端名称
+        file_path: PDF 文件路径
+        ranges: 页码区间列表 [(start, end), ...]
+
+    Returns:
+        按页面顺序排列的文本列表
+    """
+    try:
+        return _map_page_ranges(backend, file_path, ranges)
+    except BrokenProcessPool:
+        logger.warning("PDF 提取进程池已损坏，重建后重试")
+        return _map_page_ranges(backend, file_path, ranges)
@@ -3,13 +3,54 @@
 将评测结果生成 Markdown、JSON、Word 和 PPT 格式的报告
 """
 
+import io
 import os
 import json
+import orjson
+import logging
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+# 标准库回退路径写 JSON 报告时使用的文件缓冲区大小
+_JSON_WRITE_BUFFER_SIZE = 1 << 20
+
+# 汇总报告中等级分布的展示顺序
+_GRADES = ("S", "A", "B", "C", "D")
+
+# 综合评价段落模板（按等级），未列出的等级使用 _DEFAULT_GRADE_EVALUATION
+_EXCELLENT_GRADE_EVALUATION = (
+    "🎉 恭喜！您的剧本获得了 **{grade}** 级评价（{total_score}分），属于优秀水平。\n\n"
+    "剧本展现了出色的创作能力，各方面表现均衡且突出。建议保持当前水准，并在细节上继续打磨。\n\n"
+)
+_GRADE_EVALUATIONS = {
+    "S": _EXCELLENT_GRADE_EVALUATION,
+    "A": _EXCELLENT_GRADE_EVALUATION,
+    "B": (
+        "👍 您的剧本获得了 **{grade}** 级评价（{total_score}分），属于良好水平。\n\n"
+        "剧本整体表现良好，具备一定竞争力。建议根据上述改进方向进行优化，有望提升到更高等级。\n\n"
+    ),
+    "C": (
+        "💪 您的剧本获得了 **{grade}** 级评价（{total_score}分），尚有改进空间。\n\n"
+        "建议重点关注上述待改进点和改进建议，进行系统性修改，以提升剧本质量和市场竞争力。\n\n"
+    ),
+}
+_DEFAULT_GRADE_EVALUATION = (
+    "📝 您的剧本获得了 **{grade}** 级评价（{total_score}分），建议进行大幅修改。\n\n"
+    "建议从故事结构、人物塑造、对话质量等多个维度进行全面优化，参考上述改进建议逐项改进。\n\n"
+)
+
+
+def _truncate_comment(comment: str, max_length: int = 100) -> str:
+    """截断过长的评论，保证表格单元格不超过 max_length 个字符"""
+    if len(comment) > max_length:
+        return comment[:max_length - 3] + "..."
+    return comment
+
 
 class ReportGenerator:
     """评测报告生成器"""
@@ -38,51 +79,116 @@ class ReportGenerator:
         Returns:
             生成的文件路径
         """
-        import logging
-        logger = logging.getLogger(__name__)
-
         if formats is None:
             formats = ["markdown"]
 
         script_name = evaluation_result.get("script_name", "unnamed")
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
         logger.info(f"开始生成报告: {script_name}, 格式: {formats}")
 
-        generated_files = []
+        tasks = self._report_tasks(evaluation_result, formats)
 
-        if "markdown" in formats:
-            logger.info("生成 Markdown 报告...")
-            md_path = self._generate_markdown(evaluation_result, script_name, timestamp)
-            generated_files.append(md_path)
-            logger.info(f"Markdown 报告已生成: {md_path}")
+        # 只有一种格式时直接在当前线程生成；多种格式相互独立且只读评测结果，并行生成，结果按格式顺序返回
+        if len(tasks) <= 1:
+            generated_files = [self._run_report_task(task) for task in tasks]
+        else:
+            with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+                generated_files = list(executor.map(self._run_report_task, tasks))
 
-        if "json" in formats:
-            logger.info("生成 JSON 报告...")
-            json_path = self._generate_json(evaluation_result, script_name, timestamp)
-            generated_files.append(json_path)
-            logger.info(f"JSON 报告已生成: {json_path}")
+        logger.info(f"所有报告生成完成: {len(generated_files)} 个文件")
+        return generated_files
 
-        if "word" in formats or "docx" in formats:
-            logger.info("生成 Word 报告...")
-            word_path = self._generate_word(evaluation_result, script_name, timestamp)
-            generated_files.append(word_path)
-            logger.info(f"Word 报告已生成: {word_path}")
+    def generate_many(
+        self,
+        evaluation_results: List[Dict[str, Any]],
+        formats: List[str] = None,
+        workers: int = None
+    ) -> List[Optional[List[str]]]:
+        """
+        并行为多个评测结果生成报告
 
-        if "ppt" in formats or "pptx" in formats:
-            logger.info("生成 PPT 报告...")
-            ppt_path = self._generate_ppt(evaluation_result, script_name, timestamp)
-            generated_files.append(ppt_path)
-            logger.info(f"PPT 报告已生成: {ppt_path}")
+        所有剧本的所有格式在同一个线程池中生成，不再为每个剧本单独创建线程池。
+        单个剧本生成失败只记录日志，不影响其他剧本的报告。
 
-        logger.info(f"所有报告生成完成: {len(generated_files)} 个文件")
-        return generated_files
+        Args:
+            evaluation_results: 评测结果列表
+            formats: 输出格式列表 ["markdown", "json"]
+            workers: 并发数，默认为 min(报告文件数, CPU 核数)
+
+        Returns:
+            与评测结果一一对应的生成文件路径列表，生成失败的位置为 None
+        """
+        if formats is None:
+            formats = ["markdown"]
+
+        tasks_per_result = [self._report_tasks(result, formats) for result in evaluation_results]
+        task_count = sum(len(tasks) for tasks in tasks_per_result)
+        if task_count == 0:
+            return [[] for _ in evaluation_results]
+
+        if workers is None:
+            workers = min(task_count, os.cpu_count() or 1)
+
+        generated = []
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures_per_result = [[executor.submit(self._run_report_task, task) for task in tasks] for tasks in tasks_per_result]
+            for result, futures in zip(evaluation_results, futures_per_result):
+                try:
+                    generated.append([future.result() for future in futures])
+                except Exception as e:
+                    logger.error(f"生成报告失败: {result.get('script_name', 'unnamed')}, 错误: {e}")
+                    generated.append(None)
+        return generated
+
+    def _report_tasks(self, evaluation_result: Dict[str, Any], formats: List[str]) -> List[tuple]:
+        """
+        按请求的格式顺序整理某个评测结果需要生成的报告
+
+        同一格式的别名（如 word/docx）只生成一次；所有格式的文件名和报告内的生成时间使用同一时刻。
+
+        Args:
+            evaluation_result: 评测结果
+            formats: 输出格式列表
+
+        Returns:
+            报告任务列表 [(格式名称, 生成方法, 方法参数), ...]
+        """
+        script_name = evaluation_result.get("script_name", "unnamed")
+        generated_at = datetime.now()
+        timestamp = generated_at.strftime("%Y%m%d_%H%M%S")
+        args = (evaluation_result, script_name, timestamp, generated_at)
+
+        dispatch = {
+            "markdown": ("Markdown", self._generate_markdown),
+            "json": ("JSON", self._generate_json),
+            "word": ("Word", self._generate_word),
+            "docx": ("Word", self._generate_word),
+            "ppt": ("PPT", self._generate_ppt),
+            "pptx": ("PPT", self._generate_ppt),
+        }
+        tasks = []
+        seen = set()
+        for fmt in formats:
+            task = dispatch.get(fmt)
+            if task is not None and task[0] not in seen:
+                seen.add(task[0])
+                tasks.append((task[0], task[1], args))
+        return tasks
+
+    @staticmethod
+    def _run_report_task(task: tuple) -> str:
+        """执行单个报告任务，返回生成的文件路径"""
+        label, method, args = task
+        logger.info(f"生成 {label} 报告...")
+        path = method(*args)
+        logger.info(f"{label} 报告已生成: {path}")
+        return path
 
     def _generate_markdown(
         self,
         result: Dict[str, Any],
         script_name: str,
-        timestamp: str
+        timestamp: str,
+        generated_at: datetime
     ) -> str:
         """
         生成 Markdown 格式报告
@@ -91,74 +197,77 @@ class ReportGenerator:
             result: 评测结果
             script_name: 剧本名称
             timestamp: 时间戳
+            generated_at: 报告生成时间
 
         Returns:
             生成的文件路径
         """
-        import logging
-        logger = logging.getLogger(__name__)
-
         filename = f"{script_name}_{timestamp}.md"
         filepath = os.path.join(self.output_dir, filename)
 
         logger.info(f"准备生成 Markdown 报告: {filename}")
 
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                # 标题
+            # 先在内存中拼出完整报告，最后一次性编码写入文件
+            with io.StringIO() as f:
+                # 标题和综合评分
                 overall = result.get("overall", {})
-                f.write(f"# 《{script_name}》剧本评测报告\n\n")
-                f.write(f"> 生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-
-                # 综合评分
-                f.write("## 综合评分\n\n")
                 score = overall.get("total_score", 0)
                 grade = overall.get("grade", "N/A")
-                f.write(f"### {score}/100  |  等级: **{grade}**\n\n")
-
-                # 分项评分表
-                f.write("## 分项评分\n\n")
-                f.write("| 维度 | 得分 | 满分 | 权重 | 加权得分 |\n")
-                f.write("|------|------|------|------|----------|\n")
-
-                for detail in overall.get("details", []):
-                    dim = detail.get("dimension", "")
-                    score = detail.get("score", 0)
-                    max_score = detail.get("max_score", 100)
-                    weight = detail.get("weight", 0)
-                    weighted = detail.get("weighted_score", 0)
-                    f.write(f"| {dim} | {score} | {max_score} | {weight*100:.0f}% | {weighted:.2f} |\n")
-
-                f.write("\n")
+                f.write(
+                    f"# 《{script_name}》剧本评测报告\n\n"
+                    f"> 生成时间: {generated_at.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+                    "## 综合评分\n\n"
+                    f"### {score}/100  |  等级: **{grade}**\n\n"
+                    # 分项评分表
+                    "## 分项评分\n\n"
+                    "| 维度 | 得分 | 满分 | 权重 | 加权得分 |\n"
+                    "|------|------|------|------|----------|\n"
+                )
+
+                f.write("".join([
+                    f"| {detail.get('dimension', '')} | {detail.get('score', 0)} | {detail.get('max_score', 100)} | "
+                    f"{detail.get('weight', 0)*100:.0f}% | {detail.get('weighted_score', 0):.2f} |\n"
+                    for detail in overall.get("details", [])
+                ]))
 
                 # 各维度详细分析
-                f.write("## 详细分析\n\n")
+                f.write("\n## 详细分析\n\n")
+
+                # 总结部分的优点和建议在渲染各维度时一并收集，不再单独遍历
+                all_strengths = []
+                all_suggestions = []
 
                 for dim_key, dim_result in result.get("dimensions", {}).items():
+                    dim_name = dim_result.get('dimension_name', dim_key)
+                    strengths = dim_result.get('strengths', [])
+                    suggestions = dim_result.get('suggestions', [])
+                    summary_name = dim_result.get('dimension_name', '')
+                    for strength in strengths:
+                        all_strengths.append(f"[{summary_name}] {strength}")
+                    for suggestion in suggestions:
+                        all_suggestions.append(f"[{summary_name}] {suggestion}")
+
                     if "error" in dim_result:
-                        f.write(f"### {dim_result.get('dimension_name', dim_key)}\n\n")
-                        f.write(f"❌ 评测失败: {dim_result['error']}\n\n")
-                        f.write("---\n\n")
+                        f.write(f"### {dim_name}\n\n"
+                                f"❌ 评测失败: {dim_result['error']}\n\n"
+                                "---\n\n")
                         continue
 
-                    f.write(f"### {dim_result.get('dimension_name', dim_key)}\n\n")
-                    f.write(f"**得分**: {dim_result.get('total_score', 0)}/{dim_result.get('max_score', 100)}\n\n")
+                    f.write(f"### {dim_name}\n\n"
+                            f"**得分**: {dim_result.get('total_score', 0)}/{dim_result.get('max_score', 100)}\n\n")
 
                     # 子项得分
                     sub_scores = dim_result.get('sub_scores', {})
                     if sub_scores:
-                        f.write("#### 📊 子项评分\n\n")
-                        f.write("| 项目 | 得分 | 满分 | 评价 |\n")
-                        f.write("|------|------|------|------|\n")
-                        for sub_key, sub_value in sub_scores.items():
-                            name = sub_value.get("name", sub_key)
-                            score = sub_value.get("score", 0)
-                            max_score = sub_value.get("max_score", 100)
-                            comment = sub_value.get("comment", "")
-                            # 截断过长的评论
-                            if len(comment) > 100:
-                                comment = comment[:97] + "..."
-                            f.write(f"| {name} | {score} | {max_score} | {comment} |\n")
+                        f.write("#### 📊 子项评分\n\n"
+                                "| 项目 | 得分 | 满分 | 评价 |\n"
+                                "|------|------|------|------|\n")
+                        f.write("".join([
+                            f"| {sub_value.get('name', sub_key)} | {sub_value.get('score', 0)} | "
+                            f"{sub_value.get('max_score', 100)} | {_truncate_comment(sub_value.get('comment', ''))} |\n"
+                            for sub_key, sub_value in sub_scores.items()
+                        ]))
                         f.write("\n")
 
                     # 扣分项
@@ -174,34 +283,29 @@ class ReportGenerator:
                             score = penalty.get('score', 0)
                             reason = penalty.get('reason', penalty.get('details', ''))
                             total_penalty += abs(score) if score < 0 else 0
-                            f.write(f"- **{item}**: {score}分")
                             if reason:
-                                f.write(f"\n  - *{reason}*")
-                            f.write("\n")
+                                f.write(f"- **{item}**: {score}分\n  - *{reason}*\n")
+                            else:
+                                f.write(f"- **{item}**: {score}分\n")
                         f.write(f"\n**累计扣分**: {total_penalty:.0f}分\n\n")
 
                     # 优点
-                    strengths = dim_result.get('strengths', [])
                     if strengths:
                         f.write("#### ✅ 优点\n\n")
-                        for i, strength in enumerate(strengths, 1):
-                            f.write(f"{i}. {strength}\n")
+                        f.write("".join([f"{i}. {strength}\n" for i, strength in enumerate(strengths, 1)]))
                         f.write("\n")
 
                     # 待改进点
                     weaknesses = dim_result.get('weaknesses', [])
                     if weaknesses:
                         f.write("#### ⚠️ 待改进点\n\n")
-                        for i, weakness in enumerate(weaknesses, 1):
-                            f.write(f"{i}. {weakness}\n")
+                        f.write("".join([f"{i}. {weakness}\n" for i, weakness in enumerate(weaknesses, 1)]))
                         f.write("\n")
 
                     # 改进建议
-                    suggestions = dim_result.get('suggestions', [])
                     if suggestions:
                         f.write("#### 💡 改进建议\n\n")
-                        for i, suggestion in enumerate(suggestions, 1):
-                            f.write(f"**建议 {i}**: {suggestion}\n\n")
+                        f.write("".join([f"**建议 {i}**: {suggestion}\n\n" for i, suggestion in enumerate(suggestions, 1)]))
                         f.write("\n")
 
                     # 特殊内容
@@ -209,8 +313,8 @@ class ReportGenerator:
                         f.write("#### 精彩台词\n\n")
                         for line in dim_result["notable_lines"]:
                             if isinstance(line, dict):
-                                f.write(f"> **{line.get('speaker', '')}**: {line.get('line', '')}\n")
-                                f.write(f"> \n> *{line.get('reason', '')}*\n\n")
+                                f.write(f"> **{line.get('speaker', '')}**: {line.get('line', '')}\n"
+                                        f"> \n> *{line.get('reason', '')}*\n\n")
                             elif isinstance(line, str):
                                 f.write(f"> {line}\n\n")
 
@@ -219,16 +323,18 @@ class ReportGenerator:
                         for char in dim_result["character_analysis"]:
                             if isinstance(char, dict):
                                 f.write(f"**{char.get('character', '')}** ({char.get('role', '')}) - "
-                                       f"{char.get('score', 0)}/{char.get('max_score', 10)}\n\n")
-                                f.write(f"{char.get('analysis', '')}\n\n")
+                                        f"{char.get('score', 0)}/{char.get('max_score', 10)}\n\n"
+                                        f"{char.get('analysis', '')}\n\n")
                             elif isinstance(char, str):
                                 f.write(f"{char}\n\n")
 
                     if "twists_identified" in dim_result:
                         f.write("#### 反转分析\n\n")
-                        for twist in dim_result["twists_identified"]:
-                            f.write(f"- **{twist.get('position', '')}**: {twist.get('description', '')} "
-                                   f"({twist.get('effectiveness_score', 0)}/{twist.get('max_score', 10)})\n")
+                        f.write("".join([
+                            f"- **{twist.get('position', '')}**: {twist.get('description', '')} "
+                            f"({twist.get('effectiveness_score', 0)}/{twist.get('max_score', 10)})\n"
+                            for twist in dim_result["twists_identified"]
+                        ]))
                         f.write("\n")
 
                     if "target_audience" in dim_result:
@@ -252,59 +358,29 @@ class ReportGenerator:
                     f.write("---\n\n")
 
                 # 总结建议
-                f.write("## 📋 总结建议\n\n")
-
-                f.write("### 🌟 核心优势\n\n")
-                all_strengths = []
-                for dim_result in result.get("dimensions", {}).values():
-                    dim_name = dim_result.get('dimension_name', '')
-                    dim_strengths = dim_result.get("strengths", [])
-                    for strength in dim_strengths:
-                        all_strengths.append(f"[{dim_name}] {strength}")
+                f.write("## 📋 总结建议\n\n### 🌟 核心优势\n\n")
 
                 # 显示所有优点，不限制数量
-                for i, strength in enumerate(all_strengths, 1):
-                    f.write(f"{i}. {strength}\n")
-                f.write("\n")
-
-                f.write("### 🔧 重点改进方向\n\n")
-                all_suggestions = []
-                for dim_result in result.get("dimensions", {}).values():
-                    dim_name = dim_result.get('dimension_name', '')
-                    dim_suggestions = dim_result.get("suggestions", [])
-                    for suggestion in dim_suggestions:
-                        all_suggestions.append(f"[{dim_name}] {suggestion}")
+                f.write("".join([f"{i}. {strength}\n" for i, strength in enumerate(all_strengths, 1)]))
+                f.write("\n### 🔧 重点改进方向\n\n")
 
                 # 显示所有建议
-                for i, suggestion in enumerate(all_suggestions, 1):
-                    f.write(f"{i}. {suggestion}\n")
-                f.write("\n")
-
-                f.write("### 📈 综合评价\n\n")
-                overall = result.get("overall", {})
+                f.write("".join([f"{i}. {suggestion}\n" for i, suggestion in enumerate(all_suggestions, 1)]))
+                f.write("\n### 📈 综合评价\n\n")
+                # overall / grade 已在报告开头取出
                 total_score = overall.get("total_score", 0)
-                grade = overall.get("grade", "N/A")
 
-                if grade == 'A' or grade == 'S':
-                    f.write(f"🎉 恭喜！您的剧本获得了 **{grade}** 级评价（{total_score}分），属于优秀水平。\n\n")
-                    f.write("剧本展现了出色的创作能力，各方面表现均衡且突出。建议保持当前水准，并在细节上继续打磨。\n\n")
-                elif grade == 'B':
-                    f.write(f"👍 您的剧本获得了 **{grade}** 级评价（{total_score}分），属于良好水平。\n\n")
-                    f.write("剧本整体表现良好，具备一定竞争力。建议根据上述改进方向进行优化，有望提升到更高等级。\n\n")
-                elif grade == 'C':
-                    f.write(f"💪 您的剧本获得了 **{grade}** 级评价（{total_score}分），尚有改进空间。\n\n")
-                    f.write("建议重点关注上述待改进点和改进建议，进行系统性修改，以提升剧本质量和市场竞争力。\n\n")
-                else:
-                    f.write(f"📝 您的剧本获得了 **{grade}** 级评价（{total_score}分），建议进行大幅修改。\n\n")
-                    f.write("建议从故事结构、人物塑造、对话质量等多个维度进行全面优化，参考上述改进建议逐项改进。\n\n")
-
-                f.write("---\n")
-                f.write("*本报告由 AI 剧本评测系统基于豆包 seed-1.8 模型生成，仅供参考。如需更精准的分析，建议结合专业人工评审。*\n")
+                template = _GRADE_EVALUATIONS.get(grade, _DEFAULT_GRADE_EVALUATION)
+                f.write(template.format(grade=grade, total_score=total_score))
+
+                f.write("---\n"
+                        "*本报告由 AI 剧本评测系统基于豆包 seed-1.8 模型生成，仅供参考。如需更精准的分析，建议结合专业人工评审。*\n")
 
+                with open(filepath, 'wb') as out:
+                    out.write(f.getvalue().encode('utf-8'))
                 logger.info(f"Markdown 报告写入成功: {filepath}")
         except Exception as e:
             logger.error(f"Markdown 报告生成失败: {e}")
-            import traceback
             logger.error(traceback.format_exc())
             raise
 
@@ -314,7 +390,8 @@ class ReportGenerator:
         self,
         result: Dict[str, Any],
         script_name: str,
-        timestamp: str
+        timestamp: str,
+        generated_at: datetime
     ) -> str:
         """
         生成 JSON 格式报告
@@ -323,33 +400,41 @@ class ReportGenerator:
             result: 评测结果
             script_name: 剧本名称
             timestamp: 时间戳
+            generated_at: 报告生成时间
 
         Returns:
             生成的文件路径
         """
-        import logging
-        logger = logging.getLogger(__name__)
-
         filename = f"{script_name}_{timestamp}.json"
         filepath = os.path.join(self.output_dir, filename)
 
         logger.info(f"准备生成 JSON 报告: {filename}")
 
-        # 添加元数据
-        result["metadata"] = {
-            "generated_at": datetime.now().isoformat(),
-            "generator": "AI Script Evaluator v1.0",
-            "script_name": script_name
+        # 添加元数据（浅拷贝一层，不修改调用方传入的评测结果）
+        payload = {
+            **result,
+            "metadata": {
+                "generated_at": generated_at.isoformat(),
+                "generator": "AI Script Evaluator v1.0",
+                "script_name": script_name
+            }
         }
 
         try:
             logger.info("开始写入 JSON 文件...")
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
+            # 优先使用 orjson 一次性输出 UTF-8 字节；遇到其不支持的数据时回退到标准库，
+            # 经大缓冲区流式写入，避免每个小片段都触发一次系统调用
+            try:
+                data = orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            except orjson.JSONEncodeError:
+                with open(filepath, 'w', encoding='utf-8', buffering=_JSON_WRITE_BUFFER_SIZE) as f:
+                    json.dump(payload, f, ensure_ascii=False, indent=2)
+            else:
+                with open(filepath, 'wb') as f:
+                    f.write(data)
             logger.info(f"JSON 报告写入成功: {filepath}")
         except Exception as e:
             logger.error(f"JSON 报告生成失败: {e}")
-            import traceback
             logger.error(traceback.format_exc())
             raise
 
@@ -368,19 +453,22 @@ class ReportGenerator:
         Returns:
             生成的文件路径
         """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        generated_at = datetime.now()
+        timestamp = generated_at.strftime("%Y%m%d_%H%M%S")
         filename = f"batch_summary_{timestamp}.md"
         filepath = os.path.join(self.output_dir, filename)
 
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write("# 批量评测汇总报告\n\n")
-            f.write(f"> 生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"> 评测剧本数量: {len(results)}\n\n")
-
-            # 排行榜
-            f.write("## 评测排行榜\n\n")
-            f.write("| 排名 | 剧本名称 | 综合得分 | 等级 |\n")
-            f.write("|------|----------|----------|------|\n")
+        # 先在内存中拼出完整报告，最后一次性编码写入文件
+        with io.StringIO() as f:
+            f.write(
+                "# 批量评测汇总报告\n\n"
+                f"> 生成时间: {generated_at.strftime('%Y-%m-%d %H:%M:%S')}\n"
+                f"> 评测剧本数量: {len(results)}\n\n"
+                # 排行榜
+                "## 评测排行榜\n\n"
+                "| 排名 | 剧本名称 | 综合得分 | 等级 |\n"
+                "|------|----------|----------|------|\n"
+            )
 
             sorted_results = sorted(
                 results,
@@ -388,45 +476,48 @@ class ReportGenerator:
                 reverse=True
             )
 
+            # 输出排行榜的同时累计总分和等级分布
+            total_score = 0
+            grade_count = {}
             for i, result in enumerate(sorted_results, 1):
                 script_name = result.get("script_name", "Unknown")
-                score = result.get("overall", {}).get("total_score", 0)
-                grade = result.get("overall", {}).get("grade", "N/A")
+                overall = result.get("overall", {})
+                score = overall.get("total_score", 0)
+                grade = overall.get("grade", "N/A")
                 f.write(f"| {i} | {script_name} | {score} | {grade} |\n")
+                total_score += score
+                grade_count[grade] = grade_count.get(grade, 0) + 1
 
-            f.write("\n")
-
-            # 统计信息
-            f.write("## 统计信息\n\n")
-            scores = [r.get("overall", {}).get("total_score", 0) for r in results]
-            if scores:
-                avg_score = sum(scores) / len(scores)
-                max_score = max(scores)
-                min_score = min(scores)
-                f.write(f"- **平均分**: {avg_score:.2f}\n")
-                f.write(f"- **最高分**: {max_score} ({sorted_results[0].get('script_name', 'Unknown')})\n")
-                f.write(f"- **最低分**: {min_score}\n\n")
+            # 统计信息（已按得分降序排列，首尾即最高分和最低分）
+            f.write("\n## 统计信息\n\n")
+            if sorted_results:
+                top_result = sorted_results[0]
+                avg_score = total_score / len(sorted_results)
+                max_score = top_result.get("overall", {}).get("total_score", 0)
+                min_score = sorted_results[-1].get("overall", {}).get("total_score", 0)
+                f.write(f"- **平均分**: {avg_score:.2f}\n"
+                        f"- **最高分**: {max_score} ({top_result.get('script_name', 'Unknown')})\n"
+                        f"- **最低分**: {min_score}\n\n")
 
             # 等级分布
-            grade_count = {}
-            for result in results:
-                grade = result.get("overall", {}).get("grade", "N/A")
-                grade_count[grade] = grade_count.get(grade, 0) + 1
-
             f.write("### 等级分布\n\n")
-            for grade in ["S", "A", "B", "C", "D"]:
+            for grade in _GRADES:
                 count = grade_count.get(grade, 0)
                 bar = "█" * count
                 f.write(f"- **{grade}级**: {count} {bar}\n")
             f.write("\n")
 
+            with open(filepath, 'wb') as out:
+                out.write(f.getvalue().encode('utf-8'))
+
         return filepath
 
     def _generate_word(
         self,
         result: Dict[str, Any],
         script_name: str,
-        timestamp: str
+        timestamp: str,
+        generated_at: datetime
     ) -> str:
         """
         生成 Word 格式报告
@@ -435,6 +526,7 @@ class ReportGenerator:
             result: 评测结果
             script_name: 剧本名称
             timestamp: 时间戳
+            generated_at: 报告生成时间
 
         Returns:
             生成的文件路径
@@ -450,7 +542,7 @@ class ReportGenerator:
         title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
 
         # 生成时间
-        doc.add_paragraph(f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        doc.add_paragraph(f"生成时间: {generated_at.strftime('%Y-%m-%d %H:%M:%S')}")
 
         # 综合评分
         overall = result.get("overall", {})
@@ -558,7 +650,8 @@ class ReportGenerator:
         self,
         result: Dict[str, Any],
         script_name: str,
-        timestamp: str
+        timestamp: str,
+        generated_at: datetime
     ) -> str:
         """
         生成 PPT 格式报告
@@ -567,6 +660,7 @@ class ReportGenerator:
             result: 评测结果
             script_name: 剧本名称
             timestamp: 时间戳
+            generated_at: 报告生成时间
 
         Returns:
             生成的文件路径
@@ -586,7 +680,7 @@ class ReportGenerator:
         title.text = f"《{script_name}》剧本评测报告"
         
         subtitle = title_slide.placeholders[1]
-        subtitle.text = f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        subtitle.text = f"生成时间: {generated_at.strftime('%Y-%m-%d %H:%M:%S')}"
 
         # 综合评分页
         bullet_slide = prs.slides.add_slide(prs.slide_layouts[1])
@@ -607,24 +701,22 @@ class ReportGenerator:
         
         # 每页显示3个维度
         dim_items = list(dimensions.items())
-        for i in range(0, len(dim_items), 3):
+        for page, start in enumerate(range(0, len(dim_items), 3), 1):
             bullet_slide = prs.slides.add_slide(prs.slide_layouts[1])
             shapes = bullet_slide.shapes
             title_shape = shapes.title
-            title_shape.text = f"分项评分 ({i//3 + 1})"
+            title_shape.text = f"分项评分 ({page})"
 
             body_shape = shapes.placeholders[1]
             text_frame = body_shape.text_frame
             text_frame.clear()
 
-            for j in range(3):
-                if i + j < len(dim_items):
-                    dim_key, dim_result = dim_items[i + j]
-                    if "error" not in dim_result:
-                        p = text_frame.add_paragraph()
-                        p.level = j
-                        p.text = f"{dim_result.get('dimension_name', dim_key)}: {dim_result.get('total_score', 0)}/{dim_result.get('max_score', 100)}"
-                        p.font.size = Pt(18)
+            for j, (dim_key, dim_result) in enumerate(dim_items[start:start + 3]):
+                if "error" not in dim_result:
+                    p = text_frame.add_paragraph()
+                    p.level = j
+                    p.text = f"{dim_result.get('dimension_name', dim_key)}: {dim_result.get('total_score', 0)}/{dim_result.get('max_score', 100)}"
+                    p.font.size = Pt(18)
 
         # 详细分析页（每个维度一页）
         for dim_key, dim_result in dimensions.items():
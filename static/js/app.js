@@ -210,11 +210,10 @@ createApp({
             if (reportFile) {
                 try {
                     const response = await fetch(`/api/reports/${reportFile}`);
-                    const data = await response.json();
 
-                    if (data.success) {
+                    if (response.ok) {
                         // 创建下载链接
-                        const blob = new Blob([data.content], { type: 'text/markdown' });
+                        const blob = await response.blob();
                         const url = URL.createObjectURL(blob);
                         const a = document.createElement('a');
                         a.href = url;